@@ -0,0 +1,19 @@
+// La cookie JWT también autoriza los callbacks de Dash (POST): cada POST al mismo origen
+// lleva el token CSRF que flask-jwt-extended deja en una cookie legible (double submit)
+(function(){
+  const fetchOriginal = window.fetch;
+  function cookie(nombre){
+    const m = document.cookie.match(new RegExp("(?:^|; )" + nombre + "=([^;]*)"));
+    return m ? decodeURIComponent(m[1]) : "";
+  }
+  window.fetch = function(recurso, opciones){
+    opciones = opciones || {};
+    const url = new URL(typeof recurso === "string" ? recurso : recurso.url, location.href);
+    if ((opciones.method || "GET").toUpperCase() === "POST" && url.origin === location.origin) {
+      const headers = new Headers(opciones.headers || {});
+      headers.set("X-CSRF-TOKEN", cookie("csrf_access_token"));
+      opciones = Object.assign({}, opciones, {headers: headers});
+    }
+    return fetchOriginal.call(this, recurso, opciones);
+  };
+})();
@@ -0,0 +1,13 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  exportar: {
+    // links de descarga con los filtros actuales (los lee /export/<dataset>.<formato>)
+    contratos: function(version, clientes, proyecto){
+      const q = new URLSearchParams();
+      if (version) { q.append("version", version); }
+      (clientes || []).forEach(function(c){ q.append("clientes", c); });
+      if (proyecto) { q.append("proyecto", proyecto); }
+      const s = q.toString() ? "?" + q.toString() : "";
+      return ["/export/contratos.csv" + s, "/export/contratos.parquet" + s];
+    }
+  }
+});
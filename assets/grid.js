@@ -0,0 +1,11 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  grid: {
+    // row model infinite: tira los bloques en caché para que el grid los vuelva a pedir
+    refrescar: function(){
+      dash_ag_grid.getApiAsync("memory-table")
+        .then(function(api){ api.purgeInfiniteCache(); })
+        .catch(function(){});
+      return "";
+    }
+  }
+});
@@ -1,10 +1,24 @@
+// El token de localStorage solo dice que hubo login; la sesión real es la cookie JWT (la que
+// leen los callbacks y /export). Si el servidor ya no la acepta, de vuelta a /login.
+function salirSinSesion(){
+  try { localStorage.removeItem("token"); } catch(e){}
+  try { sessionStorage.removeItem("token"); } catch(e){}
+  location.replace("/login");                  // ← replace evita volver con back
+}
+
+function revisarSesion(){
+  if (location.pathname === "/login") { return; }
+  const t = localStorage.getItem("token") || sessionStorage.getItem("token");
+  if (!t) { salirSinSesion(); return; }
+  fetch("/api/sesion", {credentials: "same-origin", cache: "no-store"})
+    .then(function(r){ if (r.status === 401) { salirSinSesion(); } })
+    .catch(function(){});                      // sin red: que lo resuelva el siguiente intento
+}
+
 window.dash_clientside = Object.assign({}, window.dash_clientside, {
   guards: {
     checkToken: function(pathname){
-      if (pathname !== "/login") {
-        const t = localStorage.getItem("token") || sessionStorage.getItem("token");
-        if (!t) { location.replace("/login"); }  // ← replace evita volver con back
-      }
+      revisarSesion();
       return "";
     },
     saveToken: function(token){
@@ -15,7 +29,7 @@ window.dash_clientside = Object.assign({}, window.dash_clientside, {
       if (n){
         try { localStorage.removeItem("token"); } catch(e){}
         try { sessionStorage.removeItem("token"); } catch(e){}
-        location.replace("/login");               // ← reemplaza historial
+        location.replace("/logout");              // ← borra la cookie y manda a /login
       }
       return "";
     }
@@ -23,7 +37,8 @@ window.dash_clientside = Object.assign({}, window.dash_clientside, {
 });
 
 // Si el navegador restaura desde bfcache (al “back”), vuelve a checar:
-window.addEventListener("pageshow", function(){
-  const t = localStorage.getItem("token") || sessionStorage.getItem("token");
-  if (!t && location.pathname !== "/login") location.replace("/login");
+window.addEventListener("pageshow", revisarSesion);
+// Al volver a una pestaña que estuvo inactiva la cookie pudo haber expirado
+document.addEventListener("visibilitychange", function(){
+  if (document.visibilityState === "visible") { revisarSesion(); }
 });
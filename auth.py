@@ -1,7 +1,84 @@
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from datetime import datetime, timedelta, timezone
+
+import flask
+from flask_jwt_extended import (
+    JWTManager, create_access_token, jwt_required, get_jwt, get_jwt_identity,
+    set_access_cookies, unset_jwt_cookies, verify_jwt_in_request,
+)
+from flask_jwt_extended.config import config
 
 jwt = JWTManager()
 
+SESION = timedelta(hours=8)      # vida del JWT y de la cookie que lo lleva: expiran juntos
+RENOVAR = timedelta(hours=4)     # con menos de esto por delante, cualquier request la renueva
+
+
+def poner_cookie(resp, token):
+    # la cookie vive lo mismo que el JWT que lleva (y que el token que el guard guarda en localStorage)
+    set_access_cookies(resp, token, max_age=int(SESION.total_seconds()))
+
+
+def identidad():
+    # usuario del request según el header o la cookie (los callbacks de Dash solo llevan la cookie);
+    # None sin sesión
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
 def init_jwt(app):
     app.config["JWT_SECRET_KEY"] = "CLAVE_ULTRA_SECRETA"
+    # header para la API; cookie para las descargas (/export) y para los callbacks de Dash, que
+    # sacan los datos del usuario (partitions.py)
+    app.config["JWT_TOKEN_LOCATION"] = ["headers", "cookies"]
+    app.config["JWT_COOKIE_SAMESITE"] = "Lax"     # no viaja en POSTs de otros sitios
+    # además double submit: los POSTs con la cookie llevan X-CSRF-TOKEN (assets/csrf.js);
+    # SameSite solo no cubre navegadores viejos ni subdominios del mismo sitio
+    app.config["JWT_COOKIE_CSRF_PROTECT"] = True
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = SESION
+    app.config["JWT_SESSION_COOKIE"] = False       # con Max-Age (poner_cookie), no "hasta cerrar el navegador"
     jwt.init_app(app)
+
+    @app.after_request
+    def renovar_cookie(resp):
+        # mientras el tablero siga abierto (tick, callbacks) la cookie no expira a media sesión;
+        # nunca en una respuesta que la borra (/logout): renovarla ahí deshacería el logout
+        borrada = f"{config.access_cookie_name}=;"
+        if any(h.startswith(borrada) for h in resp.headers.getlist("Set-Cookie")):
+            return resp
+        try:
+            verify_jwt_in_request(optional=True, locations=["cookies"])
+            exp = get_jwt().get("exp")
+        except Exception:
+            return resp
+        if exp and datetime.fromtimestamp(exp, timezone.utc) - datetime.now(timezone.utc) < RENOVAR:
+            poner_cookie(resp, create_access_token(identity=get_jwt_identity()))
+        return resp
+
+    # /export se abre como link normal: sin sesión, a /login en vez de una página con el JSON del 401
+    def sin_sesion(default):
+        def responder(*args):
+            if flask.request.path.startswith("/export/"):
+                return flask.redirect("/login")
+            return default(*args)
+        return responder
+
+    jwt.expired_token_loader(sin_sesion(lambda header, payload: ({"msg": "Token has expired"}, 401)))
+    jwt.unauthorized_loader(sin_sesion(lambda motivo: ({"msg": motivo}, 401)))
+    jwt.invalid_token_loader(sin_sesion(lambda motivo: ({"msg": motivo}, 422)))
+
+    @app.route("/api/sesion")
+    def sesion():
+        # el guard de assets/guards.js: el token de localStorage no basta si la cookie ya expiró
+        usuario = identidad()
+        if usuario is None:
+            return {"msg": "Sin sesión"}, 401
+        return {"usuario": usuario}
+
+    @app.route("/logout")
+    def logout():
+        resp = flask.redirect("/login")
+        unset_jwt_cookies(resp)
+        return resp
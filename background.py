@@ -0,0 +1,114 @@
+# background.py
+# Cargas lentas en callbacks de Dash en segundo plano (DASHBOARD_BACKGROUND=1): corren en un
+# proceso aparte (DiskcacheManager), así una consulta lenta no ocupa un hilo del servidor y el
+# resto del tablero (login incluido) sigue respondiendo. El proceso no comparte memoria con el
+# servidor: consulta a través del almacén de shared.py y el servidor adopta ese archivo, por eso
+# hace falta también DASHBOARD_SHARED_DIR. Sin alguno de los dos todo sigue siendo síncrono.
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from dash import Input, Output, no_update
+
+import metrics
+import shared
+from cache import datasets
+
+try:  # opcional: sin diskcache no hay callbacks en segundo plano
+    import diskcache
+    from dash import DiskcacheManager
+except ImportError:
+    diskcache = None
+
+log = logging.getLogger(__name__)
+
+DIRECTORIO = os.environ.get("DASHBOARD_BACKGROUND_DIR", os.path.join(tempfile.gettempdir(), "dashboard-background"))
+ACTIVO = os.environ.get("DASHBOARD_BACKGROUND") == "1"
+INTERVALO = 500  # ms entre sondeos del navegador mientras corre el trabajo
+EN_VUELO = 120   # s que un trabajo cuenta como en curso; si lo cancelan, la marca vence sola
+
+if ACTIVO and (diskcache is None or not shared.DIRECTORIO):
+    log.warning("DASHBOARD_BACKGROUND=1 requiere diskcache y DASHBOARD_SHARED_DIR; las cargas siguen síncronas")
+    ACTIVO = False
+
+MANAGER = DiskcacheManager(diskcache.Cache(DIRECTORIO)) if ACTIVO else None
+
+TRABAJOS = metrics.counter("background_jobs_total", "Cargas mandadas a segundo plano", ["dataset"])
+OMITIDOS = metrics.counter("background_jobs_skipped_total", "Pedidos de carga con otro trabajo igual en curso",
+                           ["dataset"])
+
+def _al_nacer():
+    # el hijo nace con fork: un lock tomado por otro hilo del servidor en ese instante quedaría
+    # tomado para siempre (los de cache.py los renueva su propio hook), y las conexiones del
+    # pool son del padre
+    metrics._lock = threading.Lock()
+    import db
+    db.engine.dispose(close=False)
+
+
+if ACTIVO:
+    os.register_at_fork(after_in_child=_al_nacer)
+
+
+def _marca(nombre):
+    return f"en-vuelo:{nombre}"
+
+
+def pedir(nombre):
+    # en el servidor: valor para el Store que dispara el trabajo (distinto en cada pedido), o
+    # no_update si ya hay uno de este dataset en curso (de esta u otra pestaña, de cualquier
+    # worker): ese publica en el almacén y los demás lo adoptan con datasets.sincronizar.
+    # add() es atómico en diskcache: solo uno gana la marca
+    if not MANAGER.handle.add(_marca(nombre), time.time(), expire=EN_VUELO):
+        OMITIDOS.inc(dataset=nombre)
+        return no_update
+    TRABAJOS.inc(dataset=nombre)
+    return time.time()
+
+
+def cargar(nombre, loader):
+    # dentro del proceso del trabajo: consulta (o adopta lo que otro acaba de publicar) y regresa
+    # el token; el servidor lo adopta del almacén en cuanto el navegador se lo manda.
+    # Si aun así corren dos trabajos (marca vencida), el flock del almacén deja una sola consulta.
+    t0 = time.perf_counter()
+    try:
+        df, version, consulto = shared.almacen(nombre).cargar(loader, 0)
+    finally:
+        MANAGER.handle.delete(_marca(nombre))
+    if consulto:  # el snapshot también sale de aquí (snapshots.py)
+        datasets.consultado(nombre, df, {"version": version, "segundos": time.perf_counter() - t0})
+    return f"{nombre}:{version}"
+
+
+def version(nombre, loader, ttl, cargada=None):
+    # en el servidor, en cada tick: -> (token vigente, valor para el Store que pide el trabajo).
+    # token=None mientras la primera carga corre en segundo plano (y no_update si ya hay una en curso).
+    # Con datos, get() es el respaldo del scheduler: vencido el ttl refresca en un hilo y mientras
+    # tanto sirve la versión anterior (sin scheduler o si sus hilos murieron, así no se congela)
+    if cargada:
+        datasets.frame(cargada)  # adopta del almacén lo que consultó el trabajo en segundo plano
+    token = datasets.token(nombre)
+    if token is None and ACTIVO:
+        datasets.sincronizar(nombre)  # quizá el trabajo de otra pestaña ya publicó
+        token = datasets.token(nombre)
+        if token is None:  # que la consulta no ocupe este hilo
+            return None, pedir(nombre)
+    datasets.get(nombre, loader, ttl)
+    return datasets.token(nombre), no_update
+
+
+def opciones(progreso, spinner):
+    # kwargs de @callback para un trabajo en segundo plano: progreso en un Div, el dcc.Loading
+    # visible mientras corre y cancelación si el usuario se va a otra página
+    return {
+        "background": True,
+        "manager": MANAGER,
+        "interval": INTERVALO,
+        "progress": [Output(progreso, "children")],
+        "progress_default": [""],
+        "running": [(Output(spinner, "display"), "show", "auto")],
+        "cancel": [Input("url", "pathname")],
+        "prevent_initial_call": True,
+    }
@@ -0,0 +1,261 @@
+# bench.py
+# Benchmark de las etapas del tablero contra la base sintética de standin.py.
+#   python bench.py --contratos 1000 10000 100000
+#   python bench.py --contratos 100000 --json base.json          # guarda la línea base
+#   python bench.py --contratos 100000 --comparar base.json      # falla si algo empeora
+#   python bench.py --contratos 100000 --consultas               # SQL de contratos: anterior vs actual
+# Cada escala corre en su propio proceso (cachés y memoria limpias).
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+DIR_DEFAULT = os.path.join(tempfile.gettempdir(), "dashboard-bench")
+
+
+def _etapas(cv, uv):
+    import exports
+    from werkzeug.datastructures import MultiDict
+
+    # (nombre, función); cada una limpia sus memos para medir el trabajo real
+    estado = {}
+
+    def fetch_contratos():
+        estado["contratos"] = cv.fetch_contratos()
+
+    def sync_delta():
+        # un refresco incremental sin cambios: el costo fijo del modo delta
+        cv._sync.update(df=estado["contratos"], marcas=cv.fetch_marcas(), deltas=0)
+        cv.sync_contratos()
+
+    def fetch_unidades():
+        uv.datasets.invalidate("estatus-unidades")
+        estado["unidades"] = uv.fetch_unidades()
+
+    def update_table_graph():
+        cv.cubo_contratos.cache_clear()
+        cv.figura_contratos(estado["token"], (), None, "M")
+
+    def update_table_graph_filtrado():
+        clientes = tuple(sorted(estado["contratos"]["Nombre"].dropna().unique()[:5]))
+        cv.figura_contratos(estado["token"], clientes, None, "M")
+
+    def kpis():
+        cv.kpis_contratos.cache_clear()
+        cv.tarjetas_kpi(estado["token"], [], None)
+
+    def exportar(dataset, formato, args):
+        fn = exports._exports[dataset][1]
+        return sum(len(c) for c in exports.GENERADORES[formato](fn(MultiDict(args))))
+
+    def csv_contratos():
+        exportar("contratos", "csv", {"version": estado["token"]})
+
+    def parquet_contratos():
+        exportar("contratos", "parquet", {"version": estado["token"]})
+
+    def plot_unidades():
+        uv.figuras.clear()  # sin memo de figura
+        uv.plot_unidades(0, None, None)
+
+    def csv_unidades():
+        exportar("unidades", "csv", {})
+
+    return [
+        ("fetch_contratos", fetch_contratos),
+        ("sync_contratos (delta)", sync_delta),
+        ("fetch_unidades", fetch_unidades),
+        ("update_table_graph", update_table_graph),
+        ("update_table_graph (5 clientes)", update_table_graph_filtrado),
+        ("kpis", kpis),
+        ("export contratos.csv", csv_contratos),
+        ("export contratos.parquet", parquet_contratos),
+        ("plot_unidades", plot_unidades),
+        ("export unidades.csv", csv_unidades),
+    ], estado
+
+
+def _importar(ruta):
+    os.environ["DASHBOARD_DB_URL"] = "sqlite://"
+    os.environ["DASHBOARD_SCHEDULER"] = "0"  # nada de recargas en segundo plano mientras se mide
+    os.environ["DASHBOARD_SNAPSHOT_DIR"] = ""  # cada escala arranca en frío
+    sys.path.insert(0, AQUI)
+    os.chdir(AQUI)
+
+    import db
+    import standin
+    standin.instalar(db.engine, ruta)
+
+    import main  # noqa: F401  registra las páginas
+    return sys.modules["pages.contratos_view"], sys.modules["pages.unidades_view"]
+
+
+def correr_escala(n, ruta, repeticiones):
+    """Corre dentro del proceso hijo: importa la app contra la base sintética y mide."""
+    cv, uv = _importar(ruta)
+    from cache import datasets
+
+    etapas, estado = _etapas(cv, uv)
+    datasets.get("contratos", cv.sync_contratos, cv.TTL_CONTRATOS)
+    estado["token"] = datasets.token("contratos")
+
+    resultados = []
+    for nombre, fn in etapas:
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            fn()
+            tiempos.append(time.perf_counter() - t0)
+
+        # memoria en una corrida aparte: tracemalloc distorsiona los tiempos
+        tracemalloc.start()
+        fn()
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        resultados.append({
+            "etapa": nombre,
+            "mediana_s": statistics.median(tiempos),
+            "min_s": min(tiempos),
+            "pico_mb": pico / 2**20,
+        })
+    return {"contratos": n, "filas": len(estado["contratos"]), "etapas": resultados}
+
+
+def sql_agrupada(cv, where, excluir=("delta",)):
+    """La consulta de contratos anterior a la preagregación: join fila por fila con AR_Ingresos
+    y GROUP BY de todas las columnas. Solo existe para compararla con la actual (aquí y en tests/)."""
+    import schema
+    pad = " " * 12
+    select = ",\n".join(
+        f"{pad}{'ISNULL(SUM(i.Monto), 0)' if c.nombre == 'Pagado' else c.sql:<40} AS {c.nombre}"
+        for c in schema.campos("contratos") if c.sql and c.usos - set(excluir))
+    sql = cv.SQL_CONTRATOS.format(select=select, ingresos="dbo.AR_Ingresos", where=where)
+    return sql + "    GROUP BY\n" + schema.group_by("contratos", excluir) + "\n"
+
+
+def comparar_consultas(n, ruta, repeticiones):
+    """Proceso hijo: la consulta de contratos agrupada (anterior) contra la preagregada."""
+    cv, _ = _importar(ruta)
+    import pandas as pd
+    from db import read_sql
+
+    r = {"contratos": n}
+    frames = {}
+    consultas = {"agrupada": sql_agrupada(cv, cv.FILTRO_ACTIVOS),
+                 "preagregada": cv.sql_contratos(cv.FILTRO_ACTIVOS, excluir=["delta"])}
+    for nombre, sql in consultas.items():
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            df = read_sql(sql, f"fetch_contratos ({nombre})")
+            tiempos.append(time.perf_counter() - t0)
+        # el orden de las filas no está definido sin ORDER BY
+        frames[nombre] = df.sort_values("Contrato", kind="stable").reset_index(drop=True)
+        r[nombre] = statistics.median(tiempos)
+
+    try:
+        pd.testing.assert_frame_equal(frames["agrupada"], frames["preagregada"], check_dtype=False)
+        r["iguales"], r["diferencia"] = True, ""
+    except AssertionError as exc:
+        r["iguales"], r["diferencia"] = False, str(exc)
+    r["filas"] = len(frames["preagregada"])
+    return r
+
+
+def _imprimir(r):
+    print(f"\n== {r['contratos']:,} contratos ({r['filas']:,} filas en el frame) ==")
+    print(f"{'etapa':<34}{'mediana ms':>12}{'min ms':>10}{'pico MB':>10}")
+    for e in r["etapas"]:
+        print(f"{e['etapa']:<34}{e['mediana_s'] * 1000:>12.1f}{e['min_s'] * 1000:>10.1f}{e['pico_mb']:>10.1f}")
+
+
+def _imprimir_consultas(r):
+    print(f"\n== {r['contratos']:,} contratos ({r['filas']:,} filas) ==")
+    print(f"agrupada    {r['agrupada'] * 1000:>10.1f} ms")
+    print(f"preagregada {r['preagregada'] * 1000:>10.1f} ms   x{r['agrupada'] / r['preagregada']:.2f}")
+    print("resultados idénticos" if r["iguales"] else f"RESULTADOS DISTINTOS:\n{r['diferencia']}")
+
+
+def _comparar(resultados, base, tolerancia):
+    # regresión = la mediana empeora más que la tolerancia (y por más de 5 ms, para no pescar ruido)
+    previos = {(b["contratos"], e["etapa"]): e for b in base for e in b["etapas"]}
+    regresiones = []
+    for r in resultados:
+        for e in r["etapas"]:
+            b = previos.get((r["contratos"], e["etapa"]))
+            if b is None:
+                continue
+            delta = e["mediana_s"] - b["mediana_s"]
+            if delta > 0.005 and e["mediana_s"] > b["mediana_s"] * (1 + tolerancia):
+                regresiones.append((r["contratos"], e["etapa"], b["mediana_s"], e["mediana_s"]))
+    for n, etapa, antes, ahora in regresiones:
+        print(f"REGRESIÓN {n:,} / {etapa}: {antes * 1000:.1f} ms -> {ahora * 1000:.1f} ms")
+    return not regresiones
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--contratos", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                   help="escalas a medir (1k a 1M)")
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.add_argument("--dir", default=DIR_DEFAULT, help="dónde se guardan las bases sintéticas")
+    p.add_argument("--semilla", type=int, default=0)
+    p.add_argument("--reconstruir", action="store_true", help="regenera las bases aunque existan")
+    p.add_argument("--json", help="guarda los resultados en este archivo")
+    p.add_argument("--comparar", help="resultados previos (--json) contra los que se compara")
+    p.add_argument("--tolerancia", type=float, default=0.2, help="empeoramiento permitido (0.2 = 20%%)")
+    p.add_argument("--consultas", action="store_true",
+                   help="compara la consulta de contratos anterior (GROUP BY) con la preagregada")
+    p.add_argument("--_escala", type=int, help=argparse.SUPPRESS)
+    p.add_argument("--_ruta", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args._escala:  # proceso hijo
+        correr = comparar_consultas if args.consultas else correr_escala
+        print(json.dumps(correr(args._escala, args._ruta, args.repeticiones)))
+        return 0
+
+    import standin
+
+    os.makedirs(args.dir, exist_ok=True)
+    resultados = []
+    for n in args.contratos:
+        ruta = os.path.join(args.dir, f"ar_{n}_{args.semilla}.sqlite")
+        if args.reconstruir or not os.path.exists(ruta):
+            t0 = time.perf_counter()
+            standin.construir(ruta, n, args.semilla)
+            print(f"base sintética de {n:,} contratos en {time.perf_counter() - t0:.1f} s: {ruta}")
+        hijo = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--_escala", str(n), "--_ruta", ruta,
+             "--repeticiones", str(args.repeticiones)] + (["--consultas"] if args.consultas else []),
+            capture_output=True, text=True,
+        )
+        if hijo.returncode != 0:
+            sys.stderr.write(hijo.stderr)
+            return hijo.returncode
+        r = json.loads(hijo.stdout.strip().splitlines()[-1])
+        (_imprimir_consultas if args.consultas else _imprimir)(r)
+        resultados.append(r)
+
+    if args.consultas:
+        return 0 if all(r["iguales"] for r in resultados) else 1
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(resultados, f, indent=2)
+    if args.comparar:
+        with open(args.comparar) as f:
+            if not _comparar(resultados, json.load(f), args.tolerancia):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
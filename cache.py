@@ -0,0 +1,292 @@
+# cache.py
+# Caché de datasets compartida por todo el proceso: una sola consulta por TTL,
+# sin importar cuántas pestañas estén abiertas.
+import collections
+import logging
+import os
+import secrets
+import threading
+import time
+
+import metrics
+
+try:  # opcional: leer las figuras guardadas es varias veces más rápido
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+log = logging.getLogger(__name__)
+
+REINTENTO = 30  # segundos entre reintentos si la BD está fallando
+HISTORIAL = 3   # versiones que se conservan para tokens que siguen en el navegador
+
+# Sin almacén compartido cada proceso cuenta sus versiones: "contratos:5" de un worker (o de antes
+# de un reinicio) no es el mismo frame que "contratos:5" de otro. El token lleva entonces este
+# identificador del proceso y frame() no reconoce los ajenos (el callback manda todo completo)
+_proceso = secrets.token_hex(4)
+
+
+def _al_nacer():
+    global _proceso
+    _proceso = secrets.token_hex(4)  # gunicorn --preload: cada worker hijo necesita el suyo
+    # el hijo solo hereda el hilo que hizo fork: un lock tomado por otro hilo (el scheduler a media
+    # carga) quedaría tomado para siempre, y una carga "en curso" nunca avisaría que terminó
+    datasets._tras_fork()
+    figuras._lock = threading.Lock()
+
+
+class _Entrada:
+    __slots__ = ("valor", "cargado", "evento", "error", "fallo", "version", "historial")
+
+    def __init__(self):
+        self.valor = None      # último frame bueno
+        self.cargado = 0.0     # time.monotonic() de la última carga
+        self.evento = None     # Event de la carga en curso (None = ninguna)
+        self.error = None      # última excepción del loader
+        self.fallo = float("-inf")  # time.monotonic() del último error
+        self.version = 0       # sube con cada carga exitosa
+        self.historial = collections.OrderedDict()  # version -> frame
+
+
+class DatasetCache:
+    """TTL + single-flight + stale-while-revalidate por llave de consulta."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._almacenes = {}  # key -> almacén compartido entre procesos (ver shared.py)
+        self._al_cargar = []  # fn(key, valor, meta) tras cada consulta exitosa (ver snapshots.py)
+
+    def al_cargar(self, fn):
+        self._al_cargar.append(fn)
+
+    def precargar(self, key, valor):
+        # arranque en tibio: se sirve de inmediato pero cuenta como vencido,
+        # así el primer get dispara la carga real en segundo plano
+        with self._lock:
+            e = self._entradas.setdefault(key, _Entrada())
+            if e.valor is None:
+                self._publicar(e, valor, e.version + 1)
+                e.cargado = float("-inf")
+
+    def _tras_fork(self):
+        self._lock = threading.Lock()
+        for e in self._entradas.values():
+            e.evento = None  # el hilo que cargaba no existe aquí: el primero que pida vuelve a cargar
+
+    def compartir(self, key, almacen):
+        # las cargas de `key` pasan por el almacén: una consulta para todos los workers
+        self._almacenes[key] = almacen
+
+    def sincronizar(self, key):
+        # adopta la versión que otro worker ya publicó (barato si no hay nada nuevo)
+        almacen = self._almacenes.get(key)
+        if almacen is None:
+            return
+        with self._lock:
+            e = self._entradas.setdefault(key, _Entrada())
+            local = e.version
+        nuevo = almacen.adoptar(local)
+        if nuevo is not None:
+            with self._lock:
+                self._publicar(e, *nuevo)
+
+    def get(self, key, loader, ttl):
+        with self._lock:
+            e = self._entradas.setdefault(key, _Entrada())
+            if e.valor is not None:
+                ahora = time.monotonic()
+                if (ahora - e.cargado >= ttl and ahora - e.fallo >= REINTENTO
+                        and e.evento is None):
+                    # vencido: regresa lo último bueno y refresca en segundo plano
+                    e.evento = threading.Event()
+                    threading.Thread(
+                        target=self._cargar, args=(key, e, loader), daemon=True
+                    ).start()
+                return e.valor
+
+        return self._esperar(key, e, loader, forzar=False)
+
+    def refresh(self, key, loader):
+        # recarga síncrona (p. ej. la huella dice que cambió); se une a la carga en curso si hay
+        with self._lock:
+            e = self._entradas.setdefault(key, _Entrada())
+        return self._esperar(key, e, loader)
+
+    def _esperar(self, key, e, loader, forzar=True):
+        # single-flight: el primero consulta, los demás esperan esa misma consulta
+        with self._lock:
+            if not forzar and e.valor is not None:
+                return e.valor  # alguien más la cargó mientras tanto
+            evento, lider = e.evento, e.evento is None
+            if lider:
+                evento = e.evento = threading.Event()
+
+        if lider:
+            self._cargar(key, e, loader)
+        else:
+            evento.wait()
+
+        if e.valor is None:
+            raise e.error
+        return e.valor
+
+    def token(self, key):
+        # lo que viaja al navegador en lugar del dataset: "<key>:<version>" si el dataset es
+        # compartido (la versión es la misma en todos los workers), si no "<key>:<proceso>:<version>"
+        with self._lock:
+            e = self._entradas.get(key)
+            if e is None or not e.version:
+                return None
+            return f"{key}:{e.version}" if key in self._almacenes else f"{key}:{_proceso}:{e.version}"
+
+    def frame(self, token):
+        # frame de esa versión, o None si ya salió del historial (o el token no es nuestro)
+        if not token or ":" not in str(token):
+            return None
+        key, _, version = str(token).rpartition(":")
+        if not version.isdigit():
+            return None
+        if key not in self._almacenes:
+            key, _, proceso = key.rpartition(":")
+            if proceso != _proceso:  # de otro proceso: su versión N no es nuestra versión N
+                return None
+        with self._lock:
+            e = self._entradas.get(key)
+            adelantado = e is None or int(version) > e.version
+        if adelantado:  # token de otro worker que ya publicó una versión más nueva
+            self.sincronizar(key)
+        with self._lock:
+            e = self._entradas.get(key)
+            return e.historial.get(int(version)) if e is not None else None
+
+    def invalidate(self, key):
+        # fuerza que la siguiente lectura vuelva a consultar (sin tirar el frame actual)
+        with self._lock:
+            e = self._entradas.get(key)
+            if e is not None:
+                e.cargado = 0.0
+
+    def _publicar(self, e, valor, version):
+        # con almacén la versión es la del archivo compartido (la misma en todos los workers)
+        if version <= e.version:
+            return
+        e.valor, e.cargado, e.error = valor, time.monotonic(), None
+        e.version = version
+        e.historial[version] = valor
+        while len(e.historial) > HISTORIAL:
+            e.historial.popitem(last=False)
+
+    def _cargar(self, key, e, loader):
+        almacen = self._almacenes.get(key)
+        consulto = False
+        t0 = time.perf_counter()
+        try:
+            if almacen is not None:
+                valor, version, consulto = almacen.cargar(loader, e.version)
+            else:
+                valor, version, consulto = loader(), e.version + 1, True
+        except Exception as exc:
+            log.exception("Falló la carga de %s", key)
+            with self._lock:
+                e.error, e.fallo = exc, time.monotonic()
+        else:
+            with self._lock:
+                self._publicar(e, valor, version)
+                e.cargado, e.error = time.monotonic(), None  # aunque la versión ya estuviera adoptada
+        finally:
+            with self._lock:
+                evento, e.evento = e.evento, None
+            evento.set()
+
+        # después de liberar a los que esperan: escribir un snapshot no debe atrasar a nadie
+        if consulto:
+            self.consultado(key, valor, {"version": version, "segundos": time.perf_counter() - t0})
+
+    def consultado(self, key, valor, meta):
+        # hooks de al_cargar; también los llama background.cargar, que consulta fuera de get()
+        for fn in self._al_cargar:
+            try:
+                fn(key, valor, meta)
+            except Exception:
+                log.exception("Falló el hook de carga de %s", key)
+
+
+datasets = DatasetCache()
+
+
+def _numero(version):
+    # "contratos:6" -> 6 (None si no es un token de versión)
+    try:
+        return int(str(version).rpartition(":")[2])
+    except ValueError:
+        return None
+
+
+class FigureCache:
+    """LRU acotada de figuras serializadas por (dataset, versión, filtros normalizados)."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._figuras = collections.OrderedDict()  # (dataset, version, filtros) -> json
+        self._versiones = {}                       # dataset -> (versión anterior, más nueva vista)
+
+    def _avanzar(self, dataset, n):
+        # las pestañas pasan a la versión nueva en momentos distintos (hasta un tick de diferencia):
+        # mientras tanto llegan pedidos de ambas. Solo una versión más nueva desplaza a las demás;
+        # se guardan la más nueva y la anterior (la de los parches), una más vieja no toca nada
+        anterior, actual = self._versiones.get(dataset, (None, None))
+        if n is not None and (actual is None or n > actual):
+            for k in [k for k in self._figuras if k[0] == dataset and _numero(k[1]) not in (actual, n)]:
+                del self._figuras[k]
+            self._versiones[dataset] = (actual, n)
+
+    def _guardable(self, dataset, n):
+        return n is not None and n in self._versiones.get(dataset, ())
+
+    def get(self, dataset, version, filtros, build):
+        key = (dataset, version, filtros)
+        n = _numero(version)
+        with self._lock:
+            self._avanzar(dataset, n)
+            figura = self._figuras.get(key)
+            if figura is not None:
+                self._figuras.move_to_end(key)
+                self.hits += 1
+                return _loads(figura)
+            self.misses += 1
+
+        figura = build().to_json()
+        with self._lock:
+            if self._guardable(dataset, n):
+                self._figuras[key] = figura
+                while len(self._figuras) > self.maxsize:
+                    self._figuras.popitem(last=False)
+        return _loads(figura)
+
+    def peek(self, dataset, version, filtros):
+        # la figura ya construida (o None), sin construirla ni contar hit/miss
+        with self._lock:
+            figura = self._figuras.get((dataset, version, filtros))
+        return _loads(figura) if figura is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._figuras.clear()
+            self._versiones.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._figuras)}
+
+
+figuras = FigureCache()
+
+os.register_at_fork(after_in_child=_al_nacer)
+
+metrics.gauge("figure_cache_hits_total", "Figuras servidas desde la caché", lambda: figuras.hits, tipo="counter")
+metrics.gauge("figure_cache_misses_total", "Figuras construidas", lambda: figuras.misses, tipo="counter")
+metrics.gauge("figure_cache_size", "Figuras en la caché", lambda: figuras.stats()["size"])
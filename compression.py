@@ -0,0 +1,122 @@
+# compression.py
+# Respuestas comprimidas para los callbacks de Dash (/_dash-update-component) y /export:
+# brotli si el navegador lo acepta (y está instalado), si no gzip. Los callbacks se comprimen
+# solo arriba de MINIMO bytes; los exports van comprimiéndose mientras se generan.
+# También deja a orjson como motor JSON de plotly/Dash cuando está instalado.
+import os
+import time
+import zlib
+
+import flask
+import plotly.io
+
+import metrics
+
+try:  # opcional: sin brotli queda gzip
+    import brotli
+except ImportError:
+    brotli = None
+
+try:  # opcional: sin orjson plotly usa json
+    import orjson
+except ImportError:
+    orjson = None
+
+MINIMO = int(os.environ.get("DASHBOARD_COMPRESS_MIN", "1024"))  # bytes; abajo de esto no vale la pena
+NIVEL_GZIP = 5
+CALIDAD_BROTLI = 4   # 4-5: casi la razón de gzip -9 con el CPU de gzip -5
+RUTAS = {"/_dash-update-component": "callbacks", "/export/": "export"}
+COMPRIMIBLES = ("application/json", "text/")  # Parquet ya viene comprimido
+
+BYTES = metrics.counter("http_compression_bytes_total", "Bytes antes y después de comprimir",
+                        ["ruta", "encoding", "etapa"])
+SECONDS = metrics.histogram("http_compression_seconds", "CPU (del hilo) usado en comprimir cada respuesta",
+                            ["ruta", "encoding"])
+OMITIDAS = metrics.counter("http_compression_skipped_total", "Respuestas que se mandaron sin comprimir",
+                           ["ruta", "motivo"])
+
+
+def _compresor(encoding):
+    # -> (comprimir(chunk), terminar()) para ir comprimiendo por pedazos
+    if encoding == "br":
+        c = brotli.Compressor(quality=CALIDAD_BROTLI)
+        return c.process, c.finish
+    c = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    return c.compress, c.flush
+
+
+def _encoding(request):
+    aceptados = request.accept_encodings
+    if brotli is not None and aceptados["br"]:
+        return "br"
+    if aceptados["gzip"]:
+        return "gzip"
+    return None
+
+
+def _medir(ruta, encoding, original, enviado, cpu):
+    BYTES.inc(original, ruta=ruta, encoding=encoding, etapa="original")
+    BYTES.inc(enviado, ruta=ruta, encoding=encoding, etapa="enviado")
+    SECONDS.observe(cpu, ruta=ruta, encoding=encoding)
+
+
+def _flujo(chunks, encoding, ruta):
+    # comprime un export mientras se genera; las métricas se anotan al terminar
+    paso, terminar = _compresor(encoding)
+    original = enviado = 0
+    cpu = 0.0
+    for chunk in chunks:
+        original += len(chunk)
+        t0 = time.thread_time()
+        salida = paso(chunk)
+        cpu += time.thread_time() - t0
+        if salida:
+            enviado += len(salida)
+            yield salida
+    t0 = time.thread_time()
+    salida = terminar()
+    cpu += time.thread_time() - t0
+    enviado += len(salida)
+    yield salida
+    _medir(ruta, encoding, original, enviado, cpu)
+
+
+def comprimir(request, response):
+    ruta = next((n for prefijo, n in RUTAS.items() if request.path.startswith(prefijo)), None)
+    if (ruta is None or response.status_code != 200 or response.direct_passthrough
+            or "Content-Encoding" in response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not (response.mimetype or "").startswith(COMPRIMIBLES):
+        OMITIDAS.inc(ruta=ruta, motivo="tipo")
+        return response
+    encoding = _encoding(request)
+    if encoding is None:
+        OMITIDAS.inc(ruta=ruta, motivo="cliente")
+        return response
+
+    if response.is_streamed:
+        response.response = _flujo(response.iter_encoded(), encoding, ruta)
+        response.headers.pop("Content-Length", None)
+    else:
+        datos = response.get_data()
+        if len(datos) < MINIMO:
+            OMITIDAS.inc(ruta=ruta, motivo="chica")
+            return response
+        t0 = time.thread_time()
+        paso, terminar = _compresor(encoding)
+        salida = paso(datos) + terminar()
+        _medir(ruta, encoding, len(datos), len(salida), time.thread_time() - t0)
+        response.set_data(salida)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_compression(server):
+    if orjson is not None:
+        # Dash serializa cada respuesta con el motor de plotly; orjson entiende numpy sin copiar a listas
+        plotly.io.json.config.default_engine = "orjson"
+
+    @server.after_request
+    def comprimir_respuesta(response):
+        return comprimir(flask.request, response)
@@ -1,9 +1,79 @@
 # db.py
-from sqlalchemy import create_engine
+import contextvars
+import os
+import time
 
-conn_str = (
+import pandas as pd
+from sqlalchemy import create_engine, event
+
+import metrics
+
+# DASHBOARD_DB_URL permite apuntar a otra base (p. ej. "sqlite://" con standin.py para benchmarks)
+conn_str = os.environ.get("DASHBOARD_DB_URL") or (
     "mssql+pyodbc://arquimedes_readonly_user:3Gas%2545rTjA3.zPm"
     "@arquimedes.database.windows.net:1433/arquimedes"
     "?driver=ODBC+Driver+17+for+SQL+Server"
 )
 engine = create_engine(conn_str, pool_pre_ping=True)
+
+
+# ---------- Instrumentación ----------
+# fetch_* que está consultando (etiqueta de las métricas de cursor)
+consulta = contextvars.ContextVar("consulta", default="otro")
+
+CURSOR_SECONDS = metrics.histogram(
+    "db_cursor_execute_seconds", "Tiempo de execute() en el cursor", ["fetch"])
+QUERY_SECONDS = metrics.histogram(
+    "db_query_seconds", "Consulta completa: checkout + execute + lectura a DataFrame", ["fetch"])
+QUERY_ROWS = metrics.histogram(
+    "db_query_rows", "Filas devueltas por consulta", ["fetch"], buckets=metrics.FILAS)
+QUERY_BYTES = metrics.histogram(
+    "db_result_bytes", "Bytes en memoria del DataFrame resultante", ["fetch"], buckets=metrics.BYTES)
+QUERIES = metrics.counter("db_queries_total", "Consultas por resultado", ["fetch", "status"])
+CHECKOUT_SECONDS = metrics.histogram(
+    "db_pool_checkout_seconds", "Espera para obtener conexión del pool", ["fetch"])
+
+metrics.gauge("db_pool_size", "Tamaño configurado del pool", lambda: engine.pool.size())
+metrics.gauge("db_pool_checked_out", "Conexiones prestadas", lambda: engine.pool.checkedout())
+metrics.gauge("db_pool_overflow", "Conexiones por encima del tamaño del pool", lambda: engine.pool.overflow())
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("t_cursor", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    t0 = conn.info["t_cursor"].pop()
+    CURSOR_SECONDS.observe(time.perf_counter() - t0, fetch=consulta.get())
+
+
+@event.listens_for(engine, "handle_error")
+def _fallo(ctx):
+    # si el execute falla no hay after_cursor_execute: sin esto la marca se quedaría en la
+    # conexión del pool para siempre (y el siguiente _despues tomaría una que no es suya)
+    pila = ctx.connection.info.get("t_cursor") if ctx.connection is not None else None
+    if pila:
+        pila.pop()
+
+
+def read_sql(sql, fetch, params=None):
+    # pd.read_sql con métricas etiquetadas por la función que consulta
+    token = consulta.set(fetch)
+    t0 = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            CHECKOUT_SECONDS.observe(time.perf_counter() - t0, fetch=fetch)
+            df = pd.read_sql(sql, conn, params=params)
+    except Exception:
+        QUERIES.inc(fetch=fetch, status="error")
+        raise
+    finally:
+        consulta.reset(token)
+
+    QUERY_SECONDS.observe(time.perf_counter() - t0, fetch=fetch)
+    QUERY_ROWS.observe(len(df), fetch=fetch)
+    QUERY_BYTES.observe(int(df.memory_usage(deep=True).sum()), fetch=fetch)
+    QUERIES.inc(fetch=fetch, status="ok")
+    return df
@@ -0,0 +1,111 @@
+# exports.py
+# Descargas desde el dataset del servidor, por bloques: /export/<dataset>.<csv|parquet>
+# con los mismos filtros de la página en el query string (?clientes=A&clientes=B&proyecto=X).
+# El navegador ya no manda rowData de vuelta y el worker nunca arma el archivo completo.
+import io
+import time
+
+import flask
+from flask_jwt_extended import jwt_required
+
+import metrics
+
+try:  # Parquet es opcional
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+BLOQUE = 50_000  # filas por chunk de CSV / row group de Parquet
+BOM = "\ufeff"   # igual que el utf-8-sig de antes: Excel abre bien los acentos
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORTS = metrics.counter("exports_total", "Descargas por dataset y formato", ["dataset", "formato"])
+EXPORT_ROWS = metrics.histogram(
+    "export_rows", "Filas por descarga", ["dataset", "formato"], buckets=metrics.FILAS)
+EXPORT_BYTES = metrics.histogram(
+    "export_bytes", "Bytes enviados por descarga", ["dataset", "formato"], buckets=metrics.BYTES)
+EXPORT_SECONDS = metrics.histogram(
+    "export_seconds", "Tiempo de generación y envío de la descarga", ["dataset", "formato"])
+
+_exports = {}  # dataset -> (nombre de archivo sin extensión, fn(args) -> DataFrame)
+
+
+def registrar(dataset, archivo, fn):
+    # cada página registra cómo sacar sus filas a partir de los filtros del request
+    _exports[dataset] = (archivo, fn)
+
+
+def csv(df):
+    yield (BOM + df.iloc[:0].to_csv(index=False)).encode("utf-8")
+    for i in range(0, len(df), BLOQUE):
+        yield df.iloc[i:i + BLOQUE].to_csv(header=False, index=False).encode("utf-8")
+
+
+class _Tubo(io.RawIOBase):
+    # destino del ParquetWriter: junta lo escrito hasta que el generador lo entrega
+    def __init__(self):
+        self.partes, self.total = [], 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.partes.append(bytes(b))
+        self.total += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.total
+
+    def drenar(self):
+        datos, self.partes = b"".join(self.partes), []
+        return datos
+
+
+def parquet(df):
+    tubo = _Tubo()
+    esquema = pa.Table.from_pandas(df.iloc[:0], preserve_index=False).schema
+    with pq.ParquetWriter(tubo, esquema) as writer:
+        for i in range(0, len(df), BLOQUE):
+            writer.write_table(pa.Table.from_pandas(df.iloc[i:i + BLOQUE], schema=esquema, preserve_index=False))
+            yield tubo.drenar()
+    yield tubo.drenar()  # footer
+
+
+GENERADORES = {"csv": csv, "parquet": parquet}
+
+
+def _medido(chunks, dataset, formato, filas):
+    t0, enviados = time.perf_counter(), 0
+    try:
+        for chunk in chunks:
+            enviados += len(chunk)
+            yield chunk
+    finally:
+        EXPORTS.inc(dataset=dataset, formato=formato)
+        EXPORT_ROWS.observe(filas, dataset=dataset, formato=formato)
+        EXPORT_BYTES.observe(enviados, dataset=dataset, formato=formato)
+        EXPORT_SECONDS.observe(time.perf_counter() - t0, dataset=dataset, formato=formato)
+
+
+def init_exports(server):
+    @server.route("/export/<dataset>.<formato>")
+    @jwt_required()
+    def exportar(dataset, formato):
+        if dataset not in _exports or formato not in FORMATOS:
+            flask.abort(404)
+        if formato == "parquet" and pq is None:
+            return {"msg": "Parquet no disponible: falta pyarrow"}, 501
+
+        archivo, fn = _exports[dataset]
+        df = fn(flask.request.args)  # ya filtrado y con las columnas del archivo
+        chunks = _medido(GENERADORES[formato](df), dataset, formato, len(df))
+        return flask.Response(chunks, mimetype=FORMATOS[formato], headers={
+            "Content-Disposition": f'attachment; filename="{archivo}.{formato}"',
+            "Cache-Control": "no-store",
+        })
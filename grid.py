@@ -0,0 +1,117 @@
+# grid.py
+# Row model "infinite" de AG Grid servido desde un DataFrame en el servidor:
+# traduce filterModel / sortModel a operaciones vectorizadas de pandas.
+import numpy as np
+import pandas as pd
+
+
+def _texto(s, pred, nulo=False):
+    # en categóricas se evalúa sobre las categorías y se expande por código; `nulo` es lo que
+    # vale una celda vacía (el código -1 cae en ese último elemento, aun sin categorías)
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        cats = pred(pd.Series(s.cat.categories.astype(str), dtype=object).str.lower()).to_numpy(dtype=bool)
+        return pd.Series(np.append(cats, nulo)[s.cat.codes.to_numpy()], index=s.index)
+    return pred(s.astype("string").str.lower()).fillna(nulo).astype(bool)
+
+
+def _vacio(s):
+    if s.dtype == object or pd.api.types.is_string_dtype(s):
+        return s.isna() | s.astype("string").str.strip().eq("")
+    return s.isna()
+
+
+def _condicion(s, f):
+    tipo, op = f.get("filterType"), f.get("type")
+    if op == "blank":
+        return _vacio(s)
+    if op == "notBlank":
+        return ~_vacio(s)
+
+    if tipo == "text":
+        v = str(f.get("filter") or "").lower()
+        preds = {
+            "contains":    lambda x: x.str.contains(v, regex=False),
+            "notContains": lambda x: ~x.str.contains(v, regex=False),
+            "equals":      lambda x: x.eq(v),
+            "notEqual":    lambda x: x.ne(v),
+            "startsWith":  lambda x: x.str.startswith(v),
+            "endsWith":    lambda x: x.str.endswith(v),
+        }
+        # como el filtro de texto de AG Grid en el navegador: las vacías pasan notContains y notEqual
+        nulo = op in ("notContains", "notEqual")
+        return _texto(s, preds[op], nulo) if op in preds else pd.Series(True, index=s.index)
+
+    if tipo == "date":
+        x = pd.to_datetime(s, errors="coerce")
+        a = pd.to_datetime(f.get("dateFrom"), errors="coerce")
+        b = pd.to_datetime(f.get("dateTo"), errors="coerce")
+    else:  # number
+        x = pd.to_numeric(s, errors="coerce")
+        a, b = f.get("filter"), f.get("filterTo")
+
+    ops = {
+        "equals":             lambda: x.eq(a),
+        "notEqual":           lambda: x.ne(a),
+        "lessThan":           lambda: x.lt(a),
+        "lessThanOrEqual":    lambda: x.le(a),
+        "greaterThan":        lambda: x.gt(a),
+        "greaterThanOrEqual": lambda: x.ge(a),
+        "inRange":            lambda: x.gt(a) & x.lt(b),
+    }
+    return ops[op]() if op in ops else pd.Series(True, index=s.index)
+
+
+def mascara(df, filter_model):
+    m = np.ones(len(df), dtype=bool)
+    for col, f in (filter_model or {}).items():
+        if col not in df.columns:
+            continue
+        if "conditions" in f:  # filtro combinado AND / OR
+            partes = [_condicion(df[col], {"filterType": f.get("filterType"), **c})
+                      for c in f["conditions"]]
+            junta = np.logical_or if f.get("operator") == "OR" else np.logical_and
+            m &= junta.reduce([p.to_numpy(dtype=bool) for p in partes])
+        else:
+            m &= _condicion(df[col], f).to_numpy(dtype=bool)
+    return m
+
+
+def posiciones(df, filter_model=None, sort_model=None):
+    # posiciones (iloc) de las filas que pasan los filtros, ya en el orden pedido
+    pos = np.flatnonzero(mascara(df, filter_model))
+    orden = [s for s in (sort_model or []) if s.get("colId") in df.columns]
+    if orden and len(pos):
+        sub = df.iloc[pos][[s["colId"] for s in orden]].reset_index(drop=True)
+        idx = sub.sort_values(
+            [s["colId"] for s in orden],
+            ascending=[s.get("sort") != "desc" for s in orden],
+            kind="stable", na_position="last",
+        ).index.to_numpy()
+        pos = pos[idx]
+    return pos
+
+
+def bloque(df, pos, request, campos=None):
+    # respuesta para getRowsResponse: solo las filas del bloque visible
+    inicio = int(request.get("startRow") or 0)
+    fin = int(request.get("endRow") or inicio + 100)
+    filas = df.iloc[pos[inicio:fin]]
+    if campos:
+        filas = filas[[c for c in campos if c in filas.columns]]
+    # fechas como "YYYY-MM-DD", igual que llegaban de la base
+    filas = filas.assign(**{c: filas[c].dt.strftime("%Y-%m-%d")
+                            for c in filas.select_dtypes("datetime").columns})
+    return {"rowData": filas.to_dict("records"), "rowCount": int(len(pos))}
+
+
+def transaccion(anterior, nuevo, llave):
+    # rowTransaction (row model client-side) de `anterior` a `nuevo`, filas identificadas por `llave`;
+    # None si no cambió nada
+    a = {r[llave]: r for r in anterior.to_dict("records")}
+    n = {r[llave]: r for r in nuevo.to_dict("records")}
+    t = {
+        "remove": [a[k] for k in a.keys() - n.keys()],
+        "update": [r for k, r in n.items() if k in a and a[k] != r],
+        "add": [r for k, r in n.items() if k not in a],
+    }
+    return t if any(t.values()) else None
@@ -0,0 +1,363 @@
+# loadtest.py
+# Prueba de carga: N analistas simulados reproducen las secuencias de
+# _dash-update-component que manda el navegador (carga de página, tick,
+# filtros de memory-clientes / memory-proyecto, scroll del grid y CSV).
+#   python loadtest.py --usuarios 1 5 10 25 --duracion 30
+#   python loadtest.py --url http://localhost:8050 --usuarios 10     # contra una instancia ya levantada
+# Sin --url levanta main.server en otro proceso contra la base sintética de standin.py.
+import argparse
+import json
+import logging
+import os
+import random
+import string
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from bench import AQUI, DIR_DEFAULT
+from metrics import percentil
+
+# acción -> peso dentro de una sesión
+ACCIONES = {
+    "clientes": 4,
+    "proyecto": 3,
+    "periodo": 1,
+    "scroll": 3,
+    "tick": 1,
+    "csv": 1,
+    "unidades": 1,
+}
+BLOQUE_GRID = 100
+
+
+class Registro:
+    """Latencias por callback de todos los usuarios virtuales."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tiempos = {}
+        self.errores = {}
+
+    def anotar(self, nombre, dt, ok):
+        with self._lock:
+            self.tiempos.setdefault(nombre, []).append(dt)
+            if not ok:
+                self.errores[nombre] = self.errores.get(nombre, 0) + 1
+
+
+class Analista:
+    """Un usuario: mantiene el estado de los componentes y dispara los callbacks como el renderer."""
+
+    def __init__(self, url, callbacks, registro, semilla, pausa):
+        self.url = url.rstrip("/")
+        self.callbacks = callbacks
+        self.registro = registro
+        self.rng = random.Random(semilla)
+        self.pausa = pausa
+        self.http = requests.Session()
+        self.valores = {}
+        self.n_tick = 0
+
+    def disparar(self, nombre, clave, disparo):
+        # arma el payload desde /_dash-dependencies con los valores actuales de la sesión
+        dep = self.callbacks[clave]
+
+        def spec(items):
+            return [{"id": i["id"], "property": i["property"],
+                     "value": self.valores.get(f'{i["id"]}.{i["property"]}')} for i in items]
+
+        salidas = []
+        for parte in dep["output"].strip(".").split("..."):
+            id_, prop = parte.split("@")[0].rsplit(".", 1)
+            salidas.append({"id": id_, "property": prop})
+        payload = {
+            "output": dep["output"],
+            "outputs": salidas if dep["output"].startswith("..") else salidas[0],
+            "inputs": spec(dep["inputs"]),
+            "state": spec(dep["state"]),
+            "changedPropIds": [disparo],
+        }
+        t0 = time.perf_counter()
+        try:
+            # como assets/csrf.js: la cookie JWT solo vale en un POST con su token CSRF
+            csrf = {"X-CSRF-TOKEN": self.http.cookies.get("csrf_access_token", "")}
+            r = self.http.post(f"{self.url}/_dash-update-component", json=payload, headers=csrf, timeout=120)
+            ok = r.status_code in (200, 204)
+        except requests.RequestException:
+            r, ok = None, False
+        self.registro.anotar(nombre, time.perf_counter() - t0, ok)
+        if ok and r.status_code == 200:
+            for id_, props in r.json().get("response", {}).items():
+                for prop, valor in props.items():
+                    clave = f"{id_}.{prop}"
+                    self.valores[clave] = _aplicar(self.valores.get(clave), valor)
+
+    def pagina(self, path):
+        t0 = time.perf_counter()
+        try:
+            ok = self.http.get(f"{self.url}{path}", timeout=60).ok
+        except requests.RequestException:
+            ok = False
+        self.registro.anotar("GET página", time.perf_counter() - t0, ok)
+        self.valores["url.pathname"] = path
+        self.disparar("render", "frame.children", "url.pathname")
+
+    def descargar(self, nombre, path, params):
+        # /export va por streaming: se mide hasta el último byte
+        t0 = time.perf_counter()
+        try:
+            with self.http.get(f"{self.url}{path}", params=params, stream=True, timeout=300) as r:
+                for _ in r.iter_content(1 << 16):
+                    pass
+                ok = r.ok
+        except requests.RequestException:
+            ok = False
+        self.registro.anotar(nombre, time.perf_counter() - t0, ok)
+
+    def login(self, email, password):
+        # el callback de login deja la cookie JWT que pide /export
+        self.pagina("/login")
+        self.valores.update({"login-button.n_clicks": 1, "email-input.value": email,
+                             "password-input.value": password})
+        self.disparar("do_login", "login-alert.children", "login-button.n_clicks")
+
+    # ---- secuencias ----
+    def _dependientes(self, disparo):
+        # lo que el renderer vuelve a pedir cuando cambian los datos o un dropdown
+        self.disparar("tarjetas_kpi", "kpis", disparo)
+        self.disparar("update_table_graph", "memory-graph.figure", disparo)
+        self.valores["memory-table.getRowsRequest"] = {"startRow": 0, "endRow": BLOQUE_GRID}
+        self.disparar("rows_contratos", "memory-table.getRowsResponse", "memory-table.getRowsRequest")
+
+    def _datos(self):
+        self.disparar("load_data", "store-contratos.data", "tick.n_intervals")
+        self.disparar("opts_clientes", "memory-clientes.options", "store-contratos.data")
+        self.disparar("opts_proyectos", "memory-proyecto.value", "store-contratos.data")
+        self._dependientes("store-contratos.data")
+
+    def cargar_contratos(self):
+        self.pagina("/")
+        self.valores.update({
+            "tick.n_intervals": 0, "memory-clientes.value": [], "memory-proyecto.value": None,
+            "memory-periodo.value": "M",
+        })
+        self._datos()
+
+    def accion(self, tipo):
+        v = self.valores
+        if tipo == "clientes":
+            # se teclean un par de letras (búsqueda en el servidor) y se elige de lo que regresa
+            v["memory-clientes.search_value"] = "".join(self.rng.choices(string.ascii_lowercase, k=2))
+            self.disparar("opts_clientes", "memory-clientes.options", "memory-clientes.search_value")
+            opciones = [o["value"] for o in v.get("memory-clientes.options") or []]
+            v["memory-clientes.value"] = self.rng.sample(opciones, min(len(opciones), self.rng.randint(0, 3)))
+            self._dependientes("memory-clientes.value")
+        elif tipo == "proyecto":
+            opciones = [o["value"] for o in v.get("memory-proyecto.options") or []]
+            v["memory-proyecto.value"] = self.rng.choice(opciones + [None]) if opciones else None
+            self._dependientes("memory-proyecto.value")
+        elif tipo == "periodo":
+            v["memory-periodo.value"] = self.rng.choice(["D", "W", "M"])
+            self.disparar("update_table_graph", "memory-graph.figure", "memory-periodo.value")
+        elif tipo == "scroll":
+            inicio = self.rng.randint(1, 20) * BLOQUE_GRID
+            v["memory-table.getRowsRequest"] = {"startRow": inicio, "endRow": inicio + BLOQUE_GRID}
+            self.disparar("rows_contratos", "memory-table.getRowsResponse", "memory-table.getRowsRequest")
+        elif tipo == "tick":
+            self.n_tick += 1
+            v["tick.n_intervals"] = self.n_tick
+            antes = v.get("store-contratos.data")
+            self.disparar("load_data", "store-contratos.data", "tick.n_intervals")
+            if v.get("store-contratos.data") != antes:
+                self._datos()
+        elif tipo == "csv":
+            params = {"version": v.get("store-contratos.data"), "clientes": v.get("memory-clientes.value"),
+                      "proyecto": v.get("memory-proyecto.value")}
+            self.descargar("export contratos.csv", "/export/contratos.csv", params)
+        elif tipo == "unidades":
+            self.pagina("/unidades")
+            v["tick-unidades.n_intervals"] = 0
+            self.disparar("plot_unidades", "unidades-graph.figure", "tick-unidades.n_intervals")
+            self.descargar("export unidades.csv", "/export/unidades.csv", {})
+            self.cargar_contratos()
+
+    def correr(self, hasta, credenciales, interacciones=10):
+        tipos, pesos = list(ACCIONES), list(ACCIONES.values())
+        self.login(*credenciales)
+        while time.monotonic() < hasta:
+            self.cargar_contratos()
+            for _ in range(interacciones):
+                if time.monotonic() >= hasta:
+                    return
+                time.sleep(self.rng.uniform(0, self.pausa))
+                self.accion(self.rng.choices(tipos, pesos)[0])
+
+
+def _aplicar(actual, valor):
+    # como el renderer: un Patch se aplica sobre lo que ya se tenía (solo las operaciones que usa el tablero)
+    if not (isinstance(valor, dict) and "__dash_patch_update" in valor):
+        return valor
+
+    def en(ruta):
+        destino = actual
+        for paso in ruta:
+            destino = destino[paso]
+        return destino
+
+    actual = json.loads(json.dumps(actual))
+    for op in valor["operations"]:
+        ruta, p = op["location"], op["params"]
+        if op["operation"] == "Insert":
+            en(ruta).insert(p["index"], p["value"])
+        elif op["operation"] == "Append":
+            en(ruta).append(p["value"])
+        elif op["operation"] == "Assign":
+            en(ruta[:-1])[ruta[-1]] = p["value"]
+        elif op["operation"] == "Delete":
+            del en(ruta[:-1])[ruta[-1]]
+    return actual
+
+
+def _callbacks(url):
+    # output del callback -> dependencia; las claves cortas son las que usa Analista
+    deps = requests.get(f"{url}/_dash-dependencies", timeout=60).json()
+    mapa = {}
+    for dep in deps:
+        if dep.get("clientside_function"):
+            continue
+        salida = dep["output"]
+        primera = salida.strip(".").split("...")[0].split("@")[0]
+        if primera == "resumen-contratos.children":
+            mapa["kpis"] = dep
+        elif salida.startswith("..memory-proyecto.options"):
+            mapa["memory-proyecto.value"] = dep  # opts_proyectos: opciones y valor
+        else:
+            mapa[primera] = dep
+    return mapa
+
+
+def nivel(url, usuarios, duracion, pausa, semilla, credenciales):
+    registro = Registro()
+    callbacks = _callbacks(url)
+    hasta = time.monotonic() + duracion
+    hilos = [
+        threading.Thread(target=Analista(url, callbacks, registro, semilla + i, pausa).correr,
+                         args=(hasta, credenciales), daemon=True)
+        for i in range(usuarios)
+    ]
+    t0 = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    total = time.perf_counter() - t0
+
+    filas = []
+    for nombre, t in sorted(registro.tiempos.items()):
+        filas.append({
+            "callback": nombre, "n": len(t), "errores": registro.errores.get(nombre, 0),
+            "p50_ms": percentil(t, .50) * 1000, "p95_ms": percentil(t, .95) * 1000,
+            "p99_ms": percentil(t, .99) * 1000, "max_ms": max(t) * 1000,
+        })
+    n = sum(f["n"] for f in filas)
+    return {"usuarios": usuarios, "segundos": total, "requests": n,
+            "rps": n / total if total else 0.0,
+            "errores": sum(f["errores"] for f in filas), "callbacks": filas}
+
+
+def _imprimir(r):
+    print(f"\n== {r['usuarios']} usuarios: {r['requests']:,} requests en {r['segundos']:.1f} s "
+          f"({r['rps']:.1f} req/s, {r['errores']} errores) ==")
+    print(f"{'callback':<26}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'err':>6}")
+    for f in r["callbacks"]:
+        print(f"{f['callback']:<26}{f['n']:>7}{f['p50_ms']:>10.1f}{f['p95_ms']:>10.1f}"
+              f"{f['p99_ms']:>10.1f}{f['max_ms']:>10.1f}{f['errores']:>6}")
+
+
+def servir(ruta, puerto):
+    """Proceso hijo: main.server con werkzeug (threaded) contra la base sintética."""
+    os.environ["DASHBOARD_DB_URL"] = "sqlite://"
+    os.environ["DASHBOARD_SNAPSHOT_DIR"] = ""  # que los datos sintéticos no queden como snapshot
+    os.chdir(AQUI)
+    import db
+    import standin
+    standin.instalar(db.engine, ruta)
+
+    from werkzeug.serving import make_server
+    import main
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # sin una línea por request
+    make_server("127.0.0.1", puerto, main.server, threaded=True).serve_forever()
+
+
+def _esperar(url, proceso, limite=120):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if proceso.poll() is not None:
+            raise RuntimeError("el servidor terminó antes de arrancar")
+        try:
+            if requests.get(f"{url}/_dash-layout", timeout=2).ok:
+                return
+        except requests.RequestException:
+            time.sleep(0.5)
+    raise RuntimeError(f"el servidor no respondió en {limite} s")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Prueba de carga de los callbacks del tablero")
+    p.add_argument("--usuarios", type=int, nargs="+", default=[1, 5, 10, 25])
+    p.add_argument("--duracion", type=float, default=30, help="segundos por nivel de usuarios")
+    p.add_argument("--pausa", type=float, default=1.0, help="pausa máxima entre acciones (s)")
+    p.add_argument("--url", help="instancia ya levantada; si falta se arranca una local")
+    p.add_argument("--contratos", type=int, default=10_000, help="escala de la base sintética")
+    p.add_argument("--dir", default=DIR_DEFAULT)
+    p.add_argument("--puerto", type=int, default=8765)
+    p.add_argument("--semilla", type=int, default=0)
+    p.add_argument("--email", default="admin@example.com", help="usuario para la cookie de /export")
+    p.add_argument("--password", default="1234")
+    p.add_argument("--json", help="guarda los resultados en este archivo")
+    p.add_argument("--_servir", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args._servir:
+        servir(args._servir, args.puerto)
+        return 0
+
+    proceso, url = None, args.url
+    if url is None:
+        import standin
+        os.makedirs(args.dir, exist_ok=True)
+        ruta = os.path.join(args.dir, f"ar_{args.contratos}_{args.semilla}.sqlite")
+        if not os.path.exists(ruta):
+            standin.construir(ruta, args.contratos, args.semilla)
+        url = f"http://127.0.0.1:{args.puerto}"
+        proceso = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--_servir", ruta, "--puerto", str(args.puerto)],
+            stdout=subprocess.DEVNULL,
+        )
+    url = url.rstrip("/")
+
+    try:
+        if proceso is not None:
+            _esperar(url, proceso)
+        resultados = []
+        for n in args.usuarios:
+            r = nivel(url, n, args.duracion, args.pausa, args.semilla, (args.email, args.password))
+            _imprimir(r)
+            resultados.append(r)
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(resultados, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,15 @@
 # main.py
+
 import dash
 from dash import Dash, html, dcc, Output, Input
 import dash_bootstrap_components as dbc
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from auth import init_jwt
+from exports import init_exports
+from compression import init_compression
+import metrics
+from profiling import init_profiling
+from scheduler import init_scheduler
 from dash.dependencies import ClientsideFunction
 
 
@@ -16,6 +22,8 @@ app = Dash(
 )
 server = app.server
 init_jwt(server)
+init_exports(server)
+init_compression(server)
 
 @server.route("/api/data")
 @jwt_required()
@@ -24,6 +32,11 @@ def data_api():
     return {"msg": f"Hola {user}"}
 
 
+@server.route("/metrics")
+def metrics_endpoint():
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+
 # ---------- Layout base: sidebar + contenido ----------
 def sidebar():
     paginas = [ p for p in dash.page_registry.values() if p["path"] not in ("/login",) # <- oculta login 
@@ -76,5 +89,12 @@ def render(path):
     return shell(dash.page_container)
 
 
+# después de registrar todos los callbacks (páginas + este archivo)
+init_profiling(app)
+
+# recargas de datasets en segundo plano (DASHBOARD_SCHEDULER=0 lo apaga, p. ej. en bench.py)
+init_scheduler(server)
+
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,123 @@
+# metrics.py
+# Contadores e histogramas en memoria con salida en formato de texto de Prometheus.
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+FILAS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+BYTES = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+_registro = []
+_lock = threading.Lock()
+
+
+def percentil(valores, p):
+    # percentil por rango (sin interpolar) de una muestra; 0.0 si está vacía
+    valores = sorted(valores)
+    return valores[min(int(p * len(valores)), len(valores) - 1)] if valores else 0.0
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ""
+    pares = ",".join(f'{n}="{str(v)}"' for n, v in zip(nombres, valores))
+    return "{" + pares + "}"
+
+
+class Counter:
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, labels=()):
+        self.nombre, self.ayuda, self.labels = nombre, ayuda, tuple(labels)
+        self._valores = {}
+
+    def inc(self, cantidad=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with _lock:
+            self._valores[key] = self._valores.get(key, 0) + cantidad
+
+    def lineas(self):
+        with _lock:
+            valores = list(self._valores.items())
+        for key, v in valores:
+            yield f"{self.nombre}{_etiquetas(self.labels, key)} {v}"
+
+
+class Histogram:
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, labels=(), buckets=SEGUNDOS):
+        self.nombre, self.ayuda, self.labels = nombre, ayuda, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._valores = {}  # key -> [conteos por bucket..., suma, total]
+
+    def observe(self, valor, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with _lock:
+            v = self._valores.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    v[i] += 1
+            v[-2] += valor
+            v[-1] += 1
+
+    def lineas(self):
+        with _lock:
+            valores = [(k, list(v)) for k, v in self._valores.items()]
+        for key, v in valores:
+            for limite, n in zip(self.buckets, v):
+                etq = _etiquetas(self.labels + ("le",), key + (f"{limite:g}",))
+                yield f"{self.nombre}_bucket{etq} {n}"
+            etq = _etiquetas(self.labels + ("le",), key + ("+Inf",))
+            yield f"{self.nombre}_bucket{etq} {v[-1]}"
+            yield f"{self.nombre}_sum{_etiquetas(self.labels, key)} {v[-2]}"
+            yield f"{self.nombre}_count{_etiquetas(self.labels, key)} {v[-1]}"
+
+
+class Gauge:
+    # se lee al momento del scrape; fn regresa un número o {valores de labels: número}
+    def __init__(self, nombre, ayuda, fn, labels=(), tipo="gauge"):
+        self.nombre, self.ayuda, self.fn = nombre, ayuda, fn
+        self.labels, self.tipo = tuple(labels), tipo
+
+    def lineas(self):
+        valor = self.fn()
+        if valor is None:
+            return
+        if not isinstance(valor, dict):
+            valor = {(): valor}
+        for key, v in valor.items():
+            key = key if isinstance(key, tuple) else (key,)
+            yield f"{self.nombre}{_etiquetas(self.labels, key)} {v}"
+
+
+def _registrar(metrica):
+    with _lock:
+        _registro.append(metrica)
+    return metrica
+
+
+def counter(nombre, ayuda, labels=()):
+    return _registrar(Counter(nombre, ayuda, labels))
+
+
+def histogram(nombre, ayuda, labels=(), buckets=SEGUNDOS):
+    return _registrar(Histogram(nombre, ayuda, labels, buckets))
+
+
+def gauge(nombre, ayuda, fn, labels=(), tipo="gauge"):
+    return _registrar(Gauge(nombre, ayuda, fn, labels, tipo))
+
+
+def render():
+    salida = []
+    for m in list(_registro):
+        try:
+            lineas = list(m.lineas())
+        except Exception:  # un gauge roto no tira el endpoint completo
+            continue
+        salida.append(f"# HELP {m.nombre} {m.ayuda}")
+        salida.append(f"# TYPE {m.nombre} {m.tipo}")
+        salida.extend(lineas)
+    return "\n".join(salida) + "\n"
@@ -1,181 +1,362 @@
 # pages/contratos_view.py
+import json
+import logging
+import threading
+import zlib
+from functools import lru_cache
+
 import dash
 from dash import State, html, dcc, dash_table, callback, Output, Input, no_update
-import numpy as np
+from dash.exceptions import PreventUpdate
 import pandas as pd
 from dash_ag_grid import AgGrid
+from dash.dependencies import ClientsideFunction
 import plotly.express as px
-
-
-from db import engine  # <<< usa la conexión global
+from sqlalchemy import text
+
+
+from db import read_sql  # <<< usa la conexión global
+import metrics
+from cache import datasets, figuras
+import exports
+import background
+import grid
+import partitions
+import patches
+import scheduler
+import schema
+import search
+import shared
+import snapshots
+from schema import Campo, VISIBLE
+from profiling import etapa
+
+CADA_CONTRATOS = 300                  # el scheduler recarga con esta cadencia
+TTL_CONTRATOS = 3 * CADA_CONTRATOS    # respaldo por si el scheduler no está corriendo
+
+log = logging.getLogger(__name__)
 
 dash.register_page(__name__, path="/", name="Contratos")
 
-def fetch_contratos():
-    sql = """
+# Esquema del dataset: columnas del grid, orden del CSV, tipos y proyección del SELECT
+schema.registrar("contratos", [
+    Campo("ID", "cl.PK_Cliente", "id", grupo="cl.PK_Cliente"),
+    Campo("Contrato", "c.PK_Contrato", "id", usos=["sync"], grupo="c.PK_Contrato"),
+    Campo("Nombre", "cl.Alias", usos=[*VISIBLE, "filtros", "grafica"], grupo="cl.Alias"),
+    Campo("Producto", "c.Alias", grupo="c.Alias"),
+    Campo("Proyecto", "p.Nombre", usos=[*VISIBLE, "filtros", "grafica"], grupo="p.Nombre"),
+    Campo("Inversion", "c.MontoInversion", "monto", usos=[*VISIBLE, "kpis"], grupo="c.MontoInversion"),
+    Campo("Apartado", "c.MontoApartado", "monto", usos=[*VISIBLE, "kpis"], grupo="c.MontoApartado"),
+    Campo("Pagado", "ISNULL(i.Pagado, 0)", "monto", usos=[*VISIBLE, "kpis", "grafica"]),
+    Campo("Ultima_Actualizacion", "CAST(c.LastUpdateDate AS date)", "fecha",
+          usos=[*VISIBLE, "grafica"], grupo="c.LastUpdateDate"),
+    Campo("Estatus", "e.Estatus", usos=[*VISIBLE, "kpis"], grupo="e.Estatus"),
+    Campo("Tiene_Firma", "CASE WHEN c.FechaFirma IS NULL THEN 'Pendiente' ELSE 'En Proceso' END",
+          grupo="c.FechaFirma"),
+    Campo("FechaFirma", "CAST(c.FechaFirma AS date)", "fecha", usos=["grafica"], grupo="c.FechaFirma"),
+    Campo("Asesor", "u.Nombre", grupo="u.Nombre"),
+    # llave de la partición por usuario (partitions.py): el correo es la identidad del JWT
+    Campo("CorreoAsesor", "LOWER(u.Email)", usos=["particion"], grupo="u.Email"),
+    # solo en el incremental: la carga completa ya filtra activos y no consolidados
+    Campo("Activado", "c.IsActive", "entero", usos=["delta"], grupo="c.IsActive"),
+    Campo("Consolidado", "CASE WHEN c.ID_interno_consolidado IS NULL THEN 0 ELSE 1 END", "entero",
+          usos=["delta"], grupo="c.ID_interno_consolidado"),
+])
+
+# {where} permite reusar la misma consulta para la carga completa y para los deltas;
+# {select} sale del esquema. Los ingresos llegan ya sumados por contrato, así que cada
+# contrato es una sola fila y no hace falta agrupar por los textos de los catálogos.
+SQL_CONTRATOS = """
         SELECT
-            -- Identificación
-            cl.PK_Cliente                         AS ID,
-            cl.Alias                              AS Nombre,
-            c.Alias                               AS Producto,
-            p.Nombre                              AS Proyecto,
-
-            -- Inversión
-            c.MontoInversion                      AS Total_de_pagos,
-            c.MontoInversion                      AS Inversion,
-
-            -- Apartado
-            c.MontoApartado,
-            c.MontoApartado                       AS Apartado,
-            CASE  
-                WHEN c.MontoApartado < 50000 THEN 1
-                ELSE NULL
-            END                                   AS Apartados_menores_50k,
-
-            -- Pagos realizados
-            ISNULL(SUM(i.Monto), 0)              AS Pagos_reales,
-            ISNULL(SUM(i.Monto), 0) AS Pagado,
-
-            -- Fechas y estatus
-            CAST(c.LastUpdateDate AS date)       AS Ultima_Actualizacion,
-            e.Estatus                            AS Estatus,
-            CASE 
-                WHEN c.FechaFirma IS NULL THEN 'Pendiente'
-                ELSE 'En Proceso'
-            END                                   AS Tiene_Firma,
-            CAST(c.FechaFirma AS date)          AS FechaFirma,
-
-            -- Asesor y estado
-            u.Nombre                             AS Asesor,
-            c.IsActive                           AS Activado
+{select}
 
         FROM dbo.AR_Contratos       AS c
         JOIN dbo.AR_Clientes        AS cl  ON cl.PK_Cliente = c.FK_Cliente
         LEFT JOIN dbo.AR_Unidades   AS un  ON un.PK_Unidad = c.FK_Unidad
         LEFT JOIN dbo.AR_Proyectos  AS p   ON un.FK_Proyecto = p.PK_Proyecto
-        LEFT JOIN dbo.AR_Ingresos   AS i   ON i.FK_Contrato = c.PK_Contrato
+        LEFT JOIN {ingresos}   AS i   ON i.FK_Contrato = c.PK_Contrato
         LEFT JOIN dbo.CT_EstatusContrato AS e ON c.FK_EstatusContrato = e.PK_EstatusContrato
         LEFT JOIN dbo.AspNetUsers   AS u   ON u.UserId = c.FK_UsuarioAsesor
 
-        WHERE 
+        WHERE {where}
+    """
+
+INGRESOS_POR_CONTRATO = """(
+            SELECT FK_Contrato, SUM(Monto) AS Pagado
+            FROM dbo.AR_Ingresos{acotar}
+            GROUP BY FK_Contrato
+        )"""
+
+# solo los ingresos de los contratos que pasan el mismo {where} (por el índice de FK_Contrato)
+ACOTAR_INGRESOS = """
+            WHERE FK_Contrato IN (SELECT c.PK_Contrato FROM dbo.AR_Contratos AS c WHERE {where})"""
+
+
+def sql_contratos(where, excluir=(), acotar=False):
+    # acotar=True: la suma solo recorre los ingresos de los contratos del {where}; es lo que
+    # mantiene el incremental en O(cambios). La carga completa los necesita todos de todos modos
+    ingresos = INGRESOS_POR_CONTRATO.format(acotar=ACOTAR_INGRESOS.format(where=where) if acotar else "")
+    return SQL_CONTRATOS.format(select=schema.select("contratos", excluir), ingresos=ingresos, where=where)
+
+
+FILTRO_ACTIVOS = """
             c.IsActive = 1 
             AND c.ID_interno_consolidado IS NULL
+"""
+
+# Contratos tocados desde la última marca: editados o con ingresos nuevos.
+# Sin filtro de IsActive para poder sacar del frame los que se desactivaron.
+FILTRO_CAMBIOS = """
+            c.LastUpdateDate >= :desde
+            OR c.PK_Contrato IN (
+                SELECT i2.FK_Contrato FROM dbo.AR_Ingresos AS i2
+                WHERE i2.PK_Ingreso > :ultimo_ingreso
+            )
+"""
 
-        GROUP BY
-            cl.PK_Cliente, cl.Alias,
-            c.Alias, p.Nombre,
-            c.MontoInversion, c.MontoApartado,
-            c.LastUpdateDate, c.FechaFirma,
-            e.Estatus, u.Nombre,
-            c.IsActive
+SQL_MARCAS = """
+        SELECT
+            (SELECT MAX(LastUpdateDate) FROM dbo.AR_Contratos) AS desde,
+            (SELECT MAX(PK_Ingreso)     FROM dbo.AR_Ingresos)  AS ultimo_ingreso
+"""
 
-    """
-    return pd.read_sql(sql, engine)
+RECONCILIAR_CADA = 12  # refrescos incrementales entre cargas completas (bajas, borrados)
 
+MAX_UNICOS = 0.5  # texto -> categoría si en promedio cada valor se repite al menos dos veces
 
-@callback(
-    Output("resumen-contratos", "children"),
-    Input("memory-table", "rowData")
-)
-def resumen(rows):
-    import pandas as pd
-    df = pd.DataFrame(rows or [])
-
-    total_pagos = (
-        pd.to_numeric(df.get("Total_de_pagos"), errors="coerce")
-          .fillna(0).sum()
-        if "Total_de_pagos" in df.columns else 0.0
-    )
+FRAME_BYTES = {}  # última carga completa: bytes "leido" (como llega de la base) y "normalizado"
+metrics.gauge("contratos_frame_bytes", "Bytes del frame de contratos antes y después de normalizar",
+              lambda: dict(FRAME_BYTES), labels=["etapa"])
+
+
+def tipar_contratos(df):
+    # pyodbc trae DECIMAL, fechas y textos como objetos de Python: aquí quedan con dtypes compactos
+    def de_tipo(*tipos):
+        return [c for t in tipos for c in schema.de_tipo("contratos", t) if c in df]
+
+    tipos = {c: pd.to_numeric(df[c], errors="coerce").astype("float64") for c in de_tipo("monto")}
+    tipos.update({c: pd.to_numeric(df[c], downcast="integer") for c in de_tipo("id", "entero")})
+    tipos.update({c: pd.to_datetime(df[c], errors="coerce") for c in de_tipo("fecha")})
+    return df.assign(**tipos)
+
+
+def normalizar_contratos(df):
+    # carga completa: tipos + categorías para el texto repetitivo (clientes, proyectos, estatus...)
+    antes = int(df.memory_usage(deep=True).sum())
+    df = tipar_contratos(df)
+    df = df.assign(**{c: df[c].astype("category") for c in schema.de_tipo("contratos", "texto")
+                      if c in df and df[c].nunique() <= MAX_UNICOS * len(df)})
+    despues = int(df.memory_usage(deep=True).sum())
+    FRAME_BYTES.update(leido=antes, normalizado=despues)
+    log.info("contratos: %s filas, %.1f MB -> %.1f MB", len(df), antes / 2**20, despues / 2**20)
+    return df
+
+
+def fetch_contratos():
+    df = read_sql(sql_contratos(FILTRO_ACTIVOS, excluir=["delta"]), "fetch_contratos")
+    return normalizar_contratos(df)
+
+
+def fetch_contratos_delta(desde, ultimo_ingreso):
+    return tipar_contratos(read_sql(
+        text(sql_contratos(FILTRO_CAMBIOS, acotar=True)), "fetch_contratos_delta",
+        params={"desde": desde, "ultimo_ingreso": ultimo_ingreso},
+    ))
+
+
+def fetch_marcas():
+    marcas = read_sql(SQL_MARCAS, "fetch_marcas").iloc[0]
+    ultimo = marcas["ultimo_ingreso"]
+    return marcas["desde"], (int(ultimo) if pd.notna(ultimo) else 0)
+
+
+def upsert_contratos(df, cambios):
+    # reemplaza por Contrato; los desactivados/consolidados solo se eliminan
+    vigentes = cambios[(cambios["Activado"] == 1) & (cambios["Consolidado"] == 0)]
+    df = df[~df["Contrato"].isin(cambios["Contrato"])]
+
+    # mismas categorías en ambos lados (ordenadas, para que el sort del grid siga siendo alfabético);
+    # si no, concat regresa a objetos
+    cats = {c: df[c].cat.categories.union(pd.Index(vigentes[c].dropna().unique()))
+            for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype) and c in vigentes}
+    df = df.assign(**{c: df[c].cat.set_categories(v) for c, v in cats.items()})
+    vigentes = vigentes.assign(**{c: pd.Categorical(vigentes[c], categories=v) for c, v in cats.items()})
+    return pd.concat([df, vigentes.drop(columns=schema.columnas("contratos", "delta"))], ignore_index=True)
+
+
+# Estado del sync incremental (uno por proceso; la caché ya serializa las cargas)
+_sync = {"df": None, "marcas": None, "deltas": 0}
+_sync_lock = threading.Lock()
+
+
+def sync_contratos():
+    with _sync_lock:
+        # las marcas se toman antes de leer: lo que entre durante la lectura se repite después
+        marcas = fetch_marcas()
+        if _sync["df"] is None or _sync["deltas"] >= RECONCILIAR_CADA:
+            df, deltas = fetch_contratos(), 0
+        else:
+            cambios = fetch_contratos_delta(*_sync["marcas"])
+            df, deltas = upsert_contratos(_sync["df"], cambios), _sync["deltas"] + 1
+        _sync.update(df=df, marcas=marcas, deltas=deltas)
+        return df
+
+
+scheduler.registrar("contratos", sync_contratos, CADA_CONTRATOS)
+shared.compartir("contratos", fresco=CADA_CONTRATOS / 2)
+snapshots.registrar("contratos", [c.nombre for c in schema.campos("contratos") if c.usos - {"delta"}])
+
+
+def contratos(token):
+    # frame del servidor para el token del store; si ya expiró, el vigente
+    df = datasets.frame(token)
+    return df if df is not None else datasets.get("contratos", sync_contratos, TTL_CONTRATOS)
+
+
+def vigente(token):
+    # el token que de verdad se usa (el del store o, si expiró, el actual): llave de las memos.
+    # Sin token en el store aún no hay nada que pintar: load_data lo pone y eso vuelve a disparar
+    # los callbacks. Con cargas en segundo plano, la consulta nunca corre en un hilo del servidor
+    if token is None:
+        raise PreventUpdate
+    # frame() primero: adopta del almacén la versión que dejó el trabajo en segundo plano
+    if datasets.frame(token) is None and background.ACTIVO and datasets.token("contratos") is None:
+        raise PreventUpdate
+    return _vigente(token)
+
+
+def _vigente(token):
+    # /export: una descarga pedida a mano sí espera a la carga
+    if datasets.frame(token) is None:
+        datasets.get("contratos", sync_contratos, TTL_CONTRATOS)
+        return datasets.token("contratos")
+    return token
+
+
+@lru_cache(maxsize=4)
+def particiones_contratos(token):
+    # una vez por versión: posiciones de cada asesor y de cada proyecto
+    return partitions.Particiones(contratos(token), ["CorreoAsesor", "Proyecto"])
+
+
+def contratos_de(token, alcance, proyecto=None):
+    # rebanada del usuario (y del proyecto) sin recorrer el frame; token = vigente(...)
+    return particiones_contratos(token).rebanada(
+        CorreoAsesor=None if alcance == partitions.TODO else alcance, Proyecto=proyecto or None)
+
+
+def filtrar_contratos(df, clientes, proyecto):
+    if clientes and "Nombre" in df.columns:
+        df = df[df["Nombre"].isin(clientes)]
+    if proyecto and "Proyecto" in df.columns:
+        df = df[df["Proyecto"] == proyecto]
+    return df
+
+
+# La tabla y el CSV comparten columnas (ver el esquema arriba)
+column_defs = schema.column_defs("contratos")
+column_names = schema.columnas("contratos")
+
+# Gráfica: periodo de agrupación seleccionable
+PERIODOS = {"D": "Día", "W": "Semana", "M": "Mes"}
+TOP_N = 20  # clientes con nombre en la gráfica; el resto va a "Otros"
+PALETA = px.colors.qualitative.Plotly
+COLOR_OTROS = "#B0B0B0"
+
+
+def color_cliente(nombre):
+    # el mismo color en cualquier figura y proceso: las trazas que no cambian no se reenvían (ver patches.py)
+    return COLOR_OTROS if nombre == "Otros" else PALETA[zlib.crc32(str(nombre).encode()) % len(PALETA)]
+
+
+# KPIs: una sola pasada vectorizada por (versión, filtros); las tarjetas solo pintan
+@lru_cache(maxsize=64)
+def kpis_contratos(token, clientes, proyecto, alcance=partitions.TODO):
+    df = filtrar_contratos(contratos_de(token, alcance, proyecto), list(clientes), None)
+
+    inv = df["Inversion"].fillna(0).to_numpy()
+    firma = df["Estatus"].astype("string").str.strip().str.lower().eq("firma").fillna(False).to_numpy()
+
+    return {
+        "total_pagos": float(inv.sum()),
+        "pagos_real": float(df["Pagado"].fillna(0).sum()),
+        "activos": len(df),  # el frame solo tiene activos (carga completa y upsert)
+        "menores_50": int(df["Apartado"].lt(50_000).sum()),
+        "firmados": int(firma.sum()),
+        "total_inv_firmados": float(inv[firma].sum()),
+    }
 
-    pagos_real = (
-        pd.to_numeric(df.get("Pagos_reales"), errors="coerce")
-        .fillna(0).sum()
-        if "Pagos_reales" in df.columns else 0.0
-    )
-    activos = int(pd.Series(df.get("Activado")).eq(1).sum())  # o .eq("activo") si es texto
 
+def resumen(k):
     return html.Div([ 
 
                         html.H5("Activos", className="text-center mb-2"),
                         html.Div(className="d-flex gap-4 justify-content-between", children=[
                             html.Div([
                                 html.H6("💰Valor", className="mb-1"),
-                                html.H5(f"${total_pagos:,.2f}", className="mb-0 fw-bold text-primary")
+                                html.H5(f"${k['total_pagos']:,.2f}", className="mb-0 fw-bold text-primary")
                             ]),
 
                             html.Div([
                                 html.H6("💰Cobrado", className="mb-1"),
-                                html.H5(f"${pagos_real:,.2f}", className="mb-0 fw-bold text-primary")
+                                html.H5(f"${k['pagos_real']:,.2f}", className="mb-0 fw-bold text-primary")
                             ]),
                             html.Div([
                                 html.H6("Cantidad", className="mb-1"),
-                                html.H5(f"{activos:,}", className="mb-0 fw-bold text-success")
+                                html.H5(f"{k['activos']:,}", className="mb-0 fw-bold text-success")
                             ]),                            
                         ])
                     ], className="p-2", style={"height": "100%"})
 
-@callback(
-    Output("resumen-apartados", "children"),
-    Input("memory-table", "rowData")
-)
-def menores_50(rows):
-    import pandas as pd
-    df = pd.DataFrame(rows or [])
-
-    menores_50 = int(pd.Series(df.get("Apartados_menores_50k")).eq(1).sum())
 
+def menores_50(k):
     return html.Div([ 
         html.H5("Apartados menor a 50k", className="text-center mb-2"),
         html.Div(className="d-flex gap-4 justify-content-center",  children=[
             html.Div([
-                html.H1(f"{menores_50:,}", className="mb-0 fw-bold text-primary")]),
+                html.H1(f"{k['menores_50']:,}", className="mb-0 fw-bold text-primary")]),
                 ])
                 ], className="p-2", style={"height": "100%", })
 
-@callback(
-    Output("revicion-contratos", "children"),
-    Input("memory-table", "rowData")
-)
-def revicion_contratos(rows):
-    import pandas as pd
-    df = pd.DataFrame(rows or [])
-
-    # 1) Normaliza estatus y máscara de firmados
-    est = (df.get("Estatus", pd.Series(dtype=str))
-             .astype(str).str.strip().str.lower())
-    mask_firma = est.eq("firma")  # o .isin(["firma","firmado"])
-
-    # 2) Inversión numérica: usa InversionNum si existe; si no, parsea "Inversion"
-    if "InversionNum" in df.columns:
-        inv = pd.to_numeric(df["InversionNum"], errors="coerce").fillna(0)
-    else:
-        inv = (df.get("Inversion", pd.Series(dtype=str)).astype(str)
-                 .replace(r"[^\d\.-]", "", regex=True)
-                 .replace("", None).astype(float)).fillna(0)
-
-    firmados = int(mask_firma.sum())
-    total_inv_firmados = float(inv.where(mask_firma).sum())
-
 
+def revicion_contratos(k):
     return html.Div([
             html.H4("Firmados", className="text-center mb-2"),
             html.Div(className="d-flex gap-4 justify-content-between", children=[
                 html.Div([
                     html.H6("💰Valor", className="mb-1"),
-                    html.H4(f"${total_inv_firmados:,.2f}", className="mb-0 fw-bold text-success")
+                    html.H4(f"${k['total_inv_firmados']:,.2f}", className="mb-0 fw-bold text-success")
                 ]),
                 html.Div([
                     html.H6("Cantidad", className="mb-1"),
-                    html.H4(f"{firmados:,}", className="mb-0 fw-bold text-primary")
+                    html.H4(f"{k['firmados']:,}", className="mb-0 fw-bold text-primary")
                 ]),
             ])
         ], className="p-2", style={"height": "100%"})
 
 
+@callback(
+    Output("resumen-contratos", "children"),
+    Output("resumen-apartados", "children"),
+    Output("revicion-contratos", "children"),
+    Input("store-contratos", "data"),
+    Input("memory-clientes", "value"),
+    Input("memory-proyecto", "value"),
+)
+def tarjetas_kpi(token, clientes, proyecto):
+    with etapa("datos"):
+        alcance = partitions.alcance("contratos")  # antes que vigente(): sin sesión no se carga nada
+        k = kpis_contratos(vigente(token), tuple(sorted(clientes or ())), proyecto, alcance)
+    with etapa("render"):
+        return resumen(k), menores_50(k), revicion_contratos(k)
+
+
 layout = html.Div(
     className=" main-contrato",
     children=[
         html.H2("Contratos", className="page-title"),
+        dcc.Store(id="carga-contratos"),                      # pide la carga en segundo plano (background.py)
+        html.Div(id="progreso-contratos", className="text-muted"),
         dcc.Loading(
             html.Div(
             className="content d-flex flex-column",
@@ -183,15 +364,14 @@ layout = html.Div(
                 html.Div(
                     className="resultados d-flex flex-wrap mb-4",  # flex-wrap permite múltiples en fila
                     children=[
-                        dcc.Interval(id='init-load', interval=1*1000, n_intervals=0),
                         html.Div(id='resumen-contratos', className="card p-3 m-2 shadow", style={"width": "auto"}),
                         html.Div(id='resumen-apartados', className="card p-3 m-2 shadow", style={"width": "auto"}),                        
                         html.Div(id="revicion-contratos", className="card p-3 m-2 shadow", style={"width": "auto"}),
                     ]
                 ),
                 html.Div([
-                    dcc.Interval(id="tick", interval=300*1000, n_intervals=0),  # refresco cada minuto
-                    dcc.Store(id="store-contratos"),                           # aquí guardas el DF completo
+                    dcc.Interval(id="tick", interval=30*1000, n_intervals=0),  # solo revisa la versión
+                    dcc.Store(id="store-contratos"),                           # solo el token de versión; el DF vive en el servidor
                     dcc.Dropdown(
                         id="memory-clientes",
                         options=[],            # se llena por callback
@@ -208,13 +388,23 @@ layout = html.Div(
                         placeholder="Elige proyecto…", clearable=True,
                         style={"width": "40%"},
                     ),
+                    dcc.RadioItems(
+                        id="memory-periodo",
+                        options=[{"label": v, "value": k} for k, v in PERIODOS.items()],
+                        value="M", inline=True, inputClassName="me-1", labelClassName="me-3",
+                    ),
                     dcc.Graph(id="memory-graph",style={"height": "60vh", "width": "100%"}),
-                    html.Button("Descargar CSV", id="download-button", className="btn btn-outline-primary"),
-                    dcc.Download(id="download-contratos"),
+                    dcc.Store(id="memory-graph-clave"),      # (versión, filtros) de la figura que ya se mostró
+                    dcc.Store(id="memory-proyecto-version"),  # versión de la que salieron las opciones de proyecto
+                    html.A("Descargar CSV", id="download-button", href="/export/contratos.csv",
+                           className="btn btn-outline-primary me-2"),
+                    html.A("Descargar Parquet", id="download-parquet", href="/export/contratos.parquet",
+                           className="btn btn-outline-secondary"),
                     AgGrid(
                         id="memory-table",
-                        columnDefs=[],
-                        rowData=[],  # aquí le pasas los registros
+                        columnDefs=column_defs,
+                        rowModelType="infinite",  # el servidor manda solo el bloque visible
+                        dashGridOptions={"cacheBlockSize": 100, "maxBlocksInCache": 20},
                         defaultColDef={
                             "sortable": True,
                             "filter": True,
@@ -226,175 +416,223 @@ layout = html.Div(
                     )
                 ])
             ]  
-            )
+            ),
+            id="load-contratos",
         )
     ]
 ) 
-# 1) Cargar datos a memoria (una vez y luego cada minuto)
-@callback(Output("store-contratos", "data"), Input("tick", "n_intervals"))
-def load_data(_):
-    df = fetch_contratos()
-    return df.to_dict("records")
-
-# 2) Poblar el dropdown de clientes
-@callback(Output("memory-clientes", "options"), Input("store-contratos", "data"))
-def opts_clientes(data):
-    import pandas as pd
-    df = pd.DataFrame(data or [])
-    clientes = sorted(df["Nombre"].dropna().unique()) if "Nombre" in df else []
-    return [{"label": c, "value": c} for c in clientes]
-
-# 3) Poblar el dropdown de proyectos
-@callback(Output("memory-proyecto","options"),
-          Input("store-contratos","data"))
-def opts_proyectos(data):
-    import pandas as pd
-    df = pd.DataFrame(data or [])
-    if "Proyecto" not in df.columns:
-        return []
-    proyectos = sorted(df["Proyecto"].dropna().astype(str).unique())
-    return [{"label": p, "value": p} for p in proyectos]
-
-
-# 4) Filtrar en memoria según el dropdown
+# 1) Versión vigente de los datos (el scheduler los mantiene en memoria)
+@callback(
+    Output("store-contratos", "data"),
+    Output("carga-contratos", "data"),
+    Input("tick", "n_intervals"),
+    State("store-contratos", "data"),
+)
+def load_data(_, actual):
+    # las recargas las hace el scheduler; aquí solo se compara la versión
+    token, pedido = background.version("contratos", sync_contratos, TTL_CONTRATOS, actual)
+    return (no_update if token is None or token == actual else token), pedido
+
+
+if background.ACTIVO:
+    @callback(
+        Output("store-contratos", "data", allow_duplicate=True),
+        Input("carga-contratos", "data"),
+        **background.opciones("progreso-contratos", "load-contratos"),
+    )
+    def load_data_background(set_progress, _):
+        # en otro proceso: carga completa (el estado del incremental vive en el servidor)
+        set_progress("Consultando contratos…")
+        return background.cargar("contratos", fetch_contratos)
+
+# 2) Dropdown de clientes con búsqueda en el servidor: solo viajan los K mejores por tecla
+K_CLIENTES = 50
+
+
+@lru_cache(maxsize=16)
+def indice_clientes(token, alcance=partitions.TODO):
+    # uno por versión del dataset y usuario
+    df = contratos_de(token, alcance)
+    return search.Indice(df["Nombre"].dropna().unique() if "Nombre" in df else [])
+
+
+@callback(
+    Output("memory-clientes", "options"),
+    Input("memory-clientes", "search_value"),
+    Input("store-contratos", "data"),
+    State("memory-clientes", "value"),
+)
+def opts_clientes(busqueda, token, seleccion):
+    # lo ya elegido siempre va en las opciones: si no, el dropdown lo quita de la selección
+    alcance = partitions.alcance("contratos")
+    encontrados = indice_clientes(vigente(token), alcance).buscar(busqueda, K_CLIENTES)
+    # "search" sin acentos: el filtro del navegador también encuentra "José" con "jose"
+    return [{"label": c, "value": c, "search": search.normalizar(c)}
+            for c in dict.fromkeys([*(seleccion or []), *encontrados])]
+
+# 3) Poblar el dropdown de proyectos (más abajo, junto con su valor)
+def opciones_proyectos(token, alcance):
+    # los proyectos del usuario: las llaves de su partición, sin recorrer filas si ve todo
+    if alcance == partitions.TODO:
+        proyectos = particiones_contratos(token).valores("Proyecto")
+    else:
+        df = contratos_de(token, alcance)
+        proyectos = df["Proyecto"].dropna().unique() if "Proyecto" in df else []
+    return [{"label": p, "value": p} for p in sorted(map(str, proyectos))]
+
+
+# 4) Cubo (periodo, Proyecto, Nombre) -> suma de pagos; se arma una vez por versión y periodo
+@lru_cache(maxsize=16)
+def cubo_contratos(token, periodo, alcance=partitions.TODO):
+    df = contratos_de(token, alcance)
+    # Fecha: la firma y, si no hay, la última actualización
+    fecha = pd.to_datetime(df["FechaFirma"], errors="coerce").combine_first(
+        pd.to_datetime(df["Ultima_Actualizacion"], errors="coerce"))
+    return (
+        df.assign(Fecha=fecha.dt.to_period(periodo).dt.start_time)
+          .groupby(["Fecha", "Proyecto", "Nombre"], observed=True, dropna=False)["Pagado"]
+          .sum().rename("Valor_total").reset_index()
+          .dropna(subset=["Fecha"])
+    )
+
+
 @callback(
-    Output("memory-table","rowData"),
-    Output("memory-table","columnDefs"),
     Output("memory-graph","figure"),
+    Output("memory-graph-clave", "data"),
     Input("store-contratos","data"),
     Input("memory-clientes","value"),
     Input("memory-proyecto","value"),
+    Input("memory-periodo","value"),
+    State("memory-graph-clave", "data"),
 )
-def update_table_graph(raw, clientes, proyecto):
-    import numpy as np
-    import pandas as pd, plotly.express as px
-
-    df = pd.DataFrame(raw or [])
-
-    if clientes and "Nombre" in df.columns:
-        df = df[df["Nombre"].isin(clientes)]
-    if proyecto and "Proyecto" in df.columns:
-        df = df[df["Proyecto"] == proyecto]
+def update_table_graph(token, clientes, proyecto, periodo, clave):
+    alcance = partitions.alcance("contratos")
+    token, periodo = vigente(token), periodo or "M"
+    filtros = (tuple(sorted(clientes or ())), proyecto, periodo, alcance)
+    fig = figuras.get("contratos", token, filtros, lambda: figura_contratos(token, *filtros))
+    # solo las trazas que cambiaron respecto de la figura que ya tiene el navegador
+    anterior = None
+    if clave and clave[-1] == filtros[-1]:  # la clave de otro usuario (misma pestaña) no sirve
+        v, c, *resto = clave
+        anterior = figuras.peek("contratos", v, (tuple(c), *resto))
+    return patches.figura(anterior, fig), [token, *filtros]
+
+
+def figura_contratos(token, clientes, proyecto, periodo, alcance=partitions.TODO):
+    with etapa("datos"):
+        cubo = filtrar_contratos(cubo_contratos(token, periodo, alcance), clientes, proyecto)
+
+        # (Opcional) dejar solo top N clientes y agrupar el resto
+        tot = cubo.groupby("Nombre", observed=True)["Valor_total"].sum().nlargest(TOP_N).index
+        nombre = cubo["Nombre"].astype(object).where(cubo["Nombre"].isin(tot), "Otros")
+        dff = cubo.groupby(["Fecha", nombre], observed=True)["Valor_total"].sum().reset_index()
+
+    with etapa("figura"):
+        if not dff.empty:
+            # trazas en orden alfabético ("Otros" al final): al agregar un cliente se inserta una sola
+            orden = sorted(n for n in dff["Nombre"].unique() if n != "Otros")
+            orden += ["Otros"] if (dff["Nombre"] == "Otros").any() else []
+            fig = px.bar(
+                dff,
+                x="Fecha",
+                y="Valor_total",
+                color="Nombre",
+                barmode="relative",
+                labels={"Valor_total": "Total de pagos", "Fecha": "Fecha"},
+                category_orders={"Nombre": orden},
+                color_discrete_map={n: color_cliente(n) for n in orden},
+                height=500
+            )
+        else:
+            fig = px.bar(title="No hay datos suficientes para graficar")
 
-    # Fecha (primera no nula)
-    cand = [c for c in ["FechaFirma","Fecha_de_Firma","Ultima_Actualizacion","LastUpdateDate"] if c in df.columns]
-    if cand:
-        fecha = pd.to_datetime(df[cand[0]], errors="coerce")
-        for c in cand[1:]:
-            fecha = fecha.combine_first(pd.to_datetime(df[c], errors="coerce"))
-        dff = df.assign(Fecha=fecha)   # ← solo en copia
-    else:
-        dff = df.copy()
-
-    # Métrica fija: Total_de_pagos -> Valor_total
-    def parse_money(s):
-        return (s.astype(str).str.replace(r"[^\d\.-]", "", regex=True)
-                .replace("", None).astype(float))
-    
-    col = df.get("Total_de_pagos")
-    y = pd.to_numeric(col, errors="coerce") if col is not None else pd.Series(index=df.index, dtype=float)
-    if np.all(pd.isna(np.atleast_1d(y))) and "Pagado" in df.columns:
-        y = parse_money(df["Pagado"])
-    df["Valor_total"] = y
-    dff["Valor_total"] = y  
-
-# -------- BARRAS (agregado mensual) --------
-
-    if "Pagado" in df.columns:
-        df["Valor_total"] = df["Pagado"]
-        dff = dff.copy()  # <- importante si dff viene filtrado y no tiene mismo index
-        dff["Valor_total"] = dff["Pagado"] if "Pagado" in dff.columns else np.nan
-    else:
-        df["Valor_total"] = np.nan
-        dff["Valor_total"] = np.nan
-
-    # (Opcional) dejar solo top N clientes y agrupar el resto
-    TOP_N = 20
-    if "Nombre" in dff.columns and dff["Nombre"].nunique() > TOP_N:
-        tot = dff.groupby("Nombre")["Valor_total"].sum().nlargest(TOP_N).index
-        dff["Nombre"] = np.where(dff["Nombre"].isin(tot), dff["Nombre"], "Otros")
-        dff = dff.groupby(["Fecha","Nombre"], as_index=False)["Valor_total"].sum()
-
-    if "Fecha" in dff.columns and "Valor_total" in dff.columns:
-        fig = px.bar(
-            dff,
-            x="Fecha",
-            y="Valor_total",
-            color="Nombre" if "Nombre" in dff.columns else None,
-            barmode="relative",
-            labels={"Valor_total": "Total de pagos", "Fecha": "Fecha"},
-            height=500
-        )
-    else:
-        fig = px.bar(title="No hay datos suficientes para graficar")
-
-    fig.update_layout(bargap=0.05, hovermode="x unified")
-
-    # Tabla
-    column_defs = [
-        {"field": "ID"},
-        {"field": "Nombre"},
-        {"field": "Producto"},
-        {"field": "Proyecto"},
-        {"field": "Inversion", "type": "numericColumn", "valueFormatter": {"function": "d3.format('$,.2f')(params.value)"} }, 
-        { "field": "Apartado", "type": "numericColumn", "valueFormatter": {"function": "d3.format('$,.2f')(params.value)"} }, 
-        { "field": "Pagado", "type": "numericColumn", "valueFormatter": {"function": "d3.format('$,.2f')(params.value)"} },
-        {"field": "Ultima_Actualizacion"},
-        {"field": "Estatus"},
-        {"field": "Tiene_Firma"},
-        {"field": "Asesor"}
-    ]
+        fig.update_layout(bargap=0.05, hovermode="x unified")
 
-    return df.to_dict("records"), column_defs, fig 
+    return fig
 
 @callback(
-    Output("memory-proyecto", "options",allow_duplicate=True),
+    Output("memory-proyecto", "options"),
     Output("memory-proyecto", "value"),
+    Output("memory-proyecto-version", "data"),
     Input("store-contratos", "data"),
     State("memory-proyecto", "value"),   # para no reescribir si ya hay selección}
-    prevent_initial_call=True
+    State("memory-proyecto-version", "data"),
 )
-def opts_proyectos(data, current_value):
-    df = pd.DataFrame(data or [])
-    if "Proyecto" not in df.columns:
-        return [], None
-
-    proyectos = sorted(df["Proyecto"].dropna().astype(str).unique())
-    options = [{"label": p, "value": p} for p in proyectos]
+def opts_proyectos(token, current_value, version):
+    # un solo callback para opciones y valor; las opciones viajan como diff contra las que ya hay
+    alcance = partitions.alcance("contratos")
+    token = vigente(token)
+    # None si el navegador aún no tiene opciones (o ya salió del historial)
+    anteriores = opciones_proyectos(version, alcance) if datasets.frame(version) is not None else None
+    options = patches.lista(anteriores, opciones_proyectos(token, alcance))
 
     # si el usuario ya eligió algo, no lo cambies
     if current_value:
-        return options, no_update
+        return options, no_update, token
 
     # default
    #default = "AURUM TULUM" if "AURUM TULUM" in proyectos else (proyectos[0] if proyectos else None)
-    return options, None
+    return options, None, token
+
+
+# 5) Bloques de la tabla (row model infinite)
+@lru_cache(maxsize=32)
+def _posiciones(token, clientes, proyecto, filtros, orden, alcance=partitions.TODO):
+    # memo por versión + usuario + filtros: al hacer scroll solo se rebanan las mismas posiciones
+    df = filtrar_contratos(contratos_de(token, alcance, proyecto), list(clientes), None)
+    return df, grid.posiciones(df, json.loads(filtros), json.loads(orden))
 
 
 @callback(
-    Output("download-contratos", "data", allow_duplicate=True),
-    Input("download-button", "n_clicks"),
-    State("memory-table", "rowData"),
+    Output("memory-table", "getRowsResponse"),
+    Input("memory-table", "getRowsRequest"),
+    State("store-contratos", "data"),
+    State("memory-clientes", "value"),
+    State("memory-proyecto", "value"),
+)
+def rows_contratos(request, token, clientes, proyecto):
+    if not request:
+        return no_update
+    alcance = partitions.alcance("contratos")
+    df, pos = _posiciones(
+        vigente(token), tuple(sorted(clientes or ())), proyecto,   # mismo orden, misma entrada del memo
+        json.dumps(request.get("filterModel") or {}, sort_keys=True),
+        json.dumps(request.get("sortModel") or []),
+        alcance,
+    )
+    return grid.bloque(df, pos, request, column_names)
+
+
+# El grid vuelve a pedir bloques cuando cambian los datos o los dropdowns
+dash.clientside_callback(
+    ClientsideFunction(namespace="grid", function_name="refrescar"),
+    Output("download-button", "title"),   # prop dummy
+    Input("store-contratos", "data"),
+    Input("memory-clientes", "value"),
+    Input("memory-proyecto", "value"),
     prevent_initial_call=True
 )
-def download_csv(n, rows):
-    df = pd.DataFrame(rows or [])
-
-    column_defs = [
-        {"field": "ID"},
-        {"field": "Nombre"},
-        {"field": "Producto"},
-        {"field": "Proyecto"},
-        {"field": "Inversion", "type": "numericColumn", "valueFormatter": {"function": "d3.format('$,.2f')(params.value)"} }, 
-        { "field": "Apartado", "type": "numericColumn", "valueFormatter": {"function": "d3.format('$,.2f')(params.value)"} }, 
-        { "field": "Pagado", "type": "numericColumn", "valueFormatter": {"function": "d3.format('$,.2f')(params.value)"} },
-        {"field": "Ultima_Actualizacion"},
-        {"field": "Estatus"},
-        {"field": "Tiene_Firma"},
-        {"field": "Asesor"}
-    ]
 
-    column_names = [col["field"] for col in column_defs]
-    df = df[[col for col in column_names if col in df.columns]]
 
-    return dcc.send_data_frame(df.to_csv, "Contratos.csv", index=False, encoding="utf-8-sig")
+# Descargas: el link lleva los filtros actuales; /export saca las filas del frame del servidor
+dash.clientside_callback(
+    ClientsideFunction(namespace="exportar", function_name="contratos"),
+    Output("download-button", "href"),
+    Output("download-parquet", "href"),
+    Input("store-contratos", "data"),
+    Input("memory-clientes", "value"),
+    Input("memory-proyecto", "value"),
+)
+
+
+def exportar_contratos(args):
+    version = args.get("version", "")
+    if not version.startswith("contratos:"):  # solo tokens de este dataset
+        version = None
+    alcance = partitions.alcance("contratos")  # sin identidad: 401, sin cargar el dataset
+    df = contratos_de(_vigente(version), alcance, args.get("proyecto"))
+    df = filtrar_contratos(df, args.getlist("clientes"), None)
+    return df[[col for col in column_names if col in df.columns]]
+
+
+exports.registrar("contratos", "Contratos", exportar_contratos)
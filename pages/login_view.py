@@ -5,6 +5,7 @@ import pandas as pd
 import plotly.express as px
 from db import engine  # <<< usa la conexión global
 from flask_jwt_extended import create_access_token
+from auth import poner_cookie
 from dash.dependencies import ClientsideFunction
 
 dash.register_page(__name__, path="/login", name="login")
@@ -49,6 +50,7 @@ layout = html.Div(
 def do_login(n, email, password):
     if email == "admin@example.com" and password == "1234":
         token = create_access_token(identity=email)
+        poner_cookie(dash.callback_context.response, token)  # para /export y los callbacks
         return token, "/"      # ← manda token y destino
     return "Credenciales inválidas", dash.no_update
 
@@ -2,57 +2,146 @@
 import dash
 from dash import State, html, dcc, dash_table, callback, Output, Input, no_update
 import numpy as np
-import pandas as pd
 import plotly.express as px
 from dash_ag_grid import AgGrid
 
 
-from db import engine  # <<< usa la conexión global
+from db import read_sql  # <<< usa la conexión global
+from cache import datasets, figuras
+import background
+import exports
+import grid
+import patches
+import scheduler
+import schema
+import shared
+import snapshots
+from schema import Campo
+from profiling import etapa
+
+CADA_UNIDADES = 60   # el scheduler toma la huella con esta cadencia y recarga solo si cambió
+TTL_UNIDADES = 3600  # respaldo por si el scheduler no está corriendo
 
 dash.register_page(__name__, path="/unidades", name="Unidades")
 
+# Nombres que ya usa el tablero; un estatus nuevo en el catálogo aparece con su propio nombre
+ETIQUETAS = {
+    1: "Disponibles", 2: "Asignada", 3: "Pagando", 4: "Liquidada",
+    5: "Solicitud", 6: "Liberacion", 7: "Autorizadas", 8: "Escriturada",
+    9: "Bloqueado", 10: "Vendidas", 11: "Desconocido",
+}
+DISPONIBLES, VENDIDAS = ETIQUETAS[1], ETIQUETAS[10]
+TTL_CATALOGO = 3600
+
+
+def fetch_estatus():
+    sql = """
+        SELECT PK_EstatusUnidadRentable AS ID, Estatus
+        FROM dbo.CT_EstatusUnidadRentable
+        ORDER BY PK_EstatusUnidadRentable
+    """
+    cat = read_sql(sql, "fetch_estatus")
+    cat["Columna"] = [ETIQUETAS.get(i, e) for i, e in zip(cat["ID"], cat["Estatus"])]
+    return cat
+
+
+def estatus_unidades():
+    return datasets.get("estatus-unidades", fetch_estatus, TTL_CATALOGO)
+
+
+# columnas de la tabla y del CSV: una por estatus, en el orden del catálogo
+schema.registrar("unidades", [
+    Campo("Proyecto"),
+    # el grid ordena por Disponibles: así las filas que llegan por rowTransaction quedan en su lugar
+    lambda: [Campo(c, tipo="entero", **({"sort": "desc"} if c == DISPONIBLES else {}))
+             for c in estatus_unidades()["Columna"]],
+    Campo("Total", tipo="entero"),
+])
+
+
 def fetch_unidades():
     sql = """
         SELECT
-        p.Nombre AS Proyecto,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 1  THEN 1 ELSE 0 END) AS Disponibles,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 2  THEN 1 ELSE 0 END) AS Asignada,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 3  THEN 1 ELSE 0 END) AS Pagando,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 4  THEN 1 ELSE 0 END) AS Liquidada,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 5  THEN 1 ELSE 0 END) AS Solicitud,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 6  THEN 1 ELSE 0 END) AS Liberacion,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 7  THEN 1 ELSE 0 END) AS Autorizadas,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 8  THEN 1 ELSE 0 END) AS Escriturada,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 9  THEN 1 ELSE 0 END) AS Bloqueado,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 10 THEN 1 ELSE 0 END) AS Vendidas,
-        SUM(CASE WHEN un.FK_EstatusUnidadRentable = 11  THEN 1 ELSE 0 END) AS Desconocido,
-        COUNT(*) AS Total
+            p.Nombre                      AS Proyecto,
+            un.FK_EstatusUnidadRentable   AS Estatus,
+            COUNT(*)                      AS Unidades
         FROM dbo.AR_Unidades AS un
         JOIN dbo.AR_Proyectos AS p ON p.PK_Proyecto = un.FK_Proyecto
-        GROUP BY p.Nombre
-        HAVING
-            SUM(CASE WHEN un.FK_EstatusUnidadRentable IN (
-                1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11
-            ) THEN 1 ELSE 0 END) > 0
-        ORDER BY Disponibles DESC
+        GROUP BY p.Nombre, un.FK_EstatusUnidadRentable
     """
-    return pd.read_sql(sql, engine)
+    conteo = read_sql(sql, "fetch_unidades")
+    cat = estatus_unidades()
+
+    # pivote (Proyecto x Estatus); -1 = unidades sin estatus, cuentan solo en el Total
+    tabla = (conteo.assign(Estatus=conteo["Estatus"].fillna(-1).astype(int))
+                   .set_index(["Proyecto", "Estatus"])["Unidades"]
+                   .unstack(fill_value=0))
+    total = tabla.sum(axis=1)
+    tabla = tabla.reindex(columns=cat["ID"], fill_value=0)
+    tabla.columns = list(cat["Columna"])
+    tabla = tabla[tabla.sum(axis=1) > 0].assign(Total=total)  # proyectos con al menos una unidad del catálogo
+
+    return (tabla.rename_axis(index="Proyecto", columns=None).reset_index()
+                 .sort_values(DISPONIBLES, ascending=False, ignore_index=True))
+
+
+# Sonda barata: si no cambió nada en AR_Unidades no se vuelve a agregar ni a enviar
+SQL_HUELLA = """
+        SELECT
+            COUNT_BIG(*)                        AS filas,
+            CHECKSUM_AGG(CHECKSUM(
+                un.PK_Unidad, un.FK_Proyecto, un.FK_EstatusUnidadRentable
+            ))                                  AS checksum,
+            MAX(un.LastUpdateDate)              AS actualizado
+        FROM dbo.AR_Unidades AS un
+"""
+
+
+def fetch_huella():
+    h = read_sql(SQL_HUELLA, "fetch_huella").iloc[0]
+    return f"{h['filas']}|{h['checksum']}|{h['actualizado']}"
+
+
+def cargar_unidades():
+    # la huella se toma antes de leer: si algo cambia en medio, la siguiente sonda no coincide
+    huella = fetch_huella()
+    df = fetch_unidades()
+    df.attrs["huella"] = huella
+    return df
+
+
+def huella_cambio():
+    # sonda barata del scheduler: sin cambios en AR_Unidades no se vuelve a leer
+    df = datasets.frame(datasets.token("unidades"))
+    return df is None or fetch_huella() != df.attrs.get("huella")
+
+
+scheduler.registrar("unidades", cargar_unidades, CADA_UNIDADES, cambio=huella_cambio)
+shared.compartir("unidades", fresco=CADA_UNIDADES / 2)
+snapshots.registrar("unidades", ["Proyecto", "Total"])
 
 
 layout = html.Div(
     className="main-unidades",
     children=[
         dcc.Interval(id="tick-unidades", interval=60_000, n_intervals=0),  # refresco cada min
+        dcc.Store(id="version-unidades"),  # versión que ya tiene este navegador
+        dcc.Store(id="carga-unidades"),    # pide la carga en segundo plano (background.py)
+        dcc.Store(id="cargada-unidades"),  # token que trajo el trabajo en segundo plano
+        html.Div(id="progreso-unidades", className="text-muted"),
         dcc.Loading(
                     id="load-unidades",
                     children=html.Div([
                         dcc.Graph(id="unidades-graph"),
-                        html.Button("Descargar CSV", id="csv-button", className="btn btn-outline-primary"),
-                        dcc.Download(id="download-unidades"), 
+                        html.A("Descargar CSV", id="csv-button", href="/export/unidades.csv",
+                               className="btn btn-outline-primary me-2"),
+                        html.A("Descargar Parquet", href="/export/unidades.parquet",
+                               className="btn btn-outline-secondary"),
                         AgGrid(
                             id="unidades-table",
                             columnDefs=[], 
                             rowData=[],
+                            getRowId="params.data.Proyecto",  # llave de las filas en rowTransaction
                             columnSize="autoSize",  # ← Auto-ajuste de ancho de columna
                             defaultColDef={
                                 "sortable": True,
@@ -71,40 +160,66 @@ layout = html.Div(
 @callback(
     Output("unidades-graph", "figure"),
     Output("unidades-table", "rowData"),
+    Output("unidades-table", "rowTransaction"),
     Output("unidades-table", "columnDefs"),
+    Output("version-unidades", "data"),
+    Output("carga-unidades", "data"),
     Input("tick-unidades", "n_intervals"),
+    Input("cargada-unidades", "data"),
+    State("version-unidades", "data"),
 )
-def plot_unidades(_):
+def plot_unidades(_, cargada, version_cliente):
     import plotly.express as px
 
-    df = fetch_unidades()  # columnas: Proyecto, Disponibles, Vendidas, Total
-
-    cols = [
-        {"field": "Proyecto"},
-        {"field": "Disponibles", "type": "numericColumn"},
-        {"field": "Asignada", "type": "numericColumn"},
-        {"field": "Pagando", "type": "numericColumn"},
-        {"field": "Liquidada", "type": "numericColumn"},
-        {"field": "Solicitud", "type": "numericColumn"},        
-        {"field": "Liberacion", "type": "numericColumn"},
-        {"field": "Autorizadas", "type": "numericColumn"},
-        {"field": "Escriturada", "type": "numericColumn"},
-        {"field": "Bloqueado", "type": "numericColumn"},
-        {"field": "Vendidas", "type": "numericColumn"},
-        {"field": "Total", "type": "numericColumn"},
-    ]
+    with etapa("datos"):
+        # las recargas las hace el scheduler; aquí solo se compara la versión
+        token, pedido = background.version("unidades", cargar_unidades, TTL_UNIDADES, cargada)
+        if token is None:
+            return (no_update,) * 5 + (pedido,)
+        if token == version_cliente:
+            return (no_update,) * 6
+        df = datasets.frame(token)  # columnas: Proyecto, Disponibles, Vendidas, Total
+
+    # lo que ya tiene el navegador (si su versión sigue en el historial) para mandar solo diferencias
+    previo = datasets.frame(version_cliente)
+    # columnDefs solo cambian con el catálogo de estatus
+    mismas = previo is not None and list(previo.columns) == list(df.columns)
+    cols = no_update if mismas else schema.column_defs("unidades")
 
     if df.empty:
         fig = px.bar(title="Unidades por proyecto", height=500)
-        return fig, [], cols
+        return fig, [], no_update, cols, token, no_update
 
     # ordenar por Disponibles
-    df = df.sort_values("Disponibles", ascending=False)
+    df = df.sort_values(DISPONIBLES, ascending=False)
+
+    with etapa("figura"):
+        fig = patches.figura(figuras.peek("unidades", version_cliente, ()),
+                             figuras.get("unidades", token, (), lambda: figura_unidades(df)))
 
+    # filas: completas la primera vez; después altas, bajas y cambios por Proyecto
+    if not mismas or previo.empty:
+        return fig, df.to_dict("records"), no_update, cols, token, no_update
+    return fig, no_update, grid.transaccion(previo, df, "Proyecto") or no_update, cols, token, no_update
+
+
+if background.ACTIVO:
+    @callback(
+        Output("cargada-unidades", "data"),
+        Input("carga-unidades", "data"),
+        **background.opciones("progreso-unidades", "load-unidades"),
+    )
+    def plot_unidades_background(set_progress, _):
+        # en otro proceso; plot_unidades arma la figura cuando llega el token
+        set_progress("Consultando unidades…")
+        return background.cargar("unidades", cargar_unidades)
+
+
+def figura_unidades(df):
     # Barras agrupadas: Disponibles vs Vendidas por proyecto
     dff = df.melt(
         id_vars=["Proyecto"],
-        value_vars=["Disponibles", "Vendidas"],
+        value_vars=[DISPONIBLES, VENDIDAS],
         var_name="Estatus",
         value_name="Unidades",
     )
@@ -125,23 +240,13 @@ def plot_unidades(_):
         yaxis_title="Unidades",
         xaxis=dict(categoryorder="array", categoryarray=df["Proyecto"]),
     )
+    return fig
 
-    return fig, df.to_dict("records"), cols
-
-@callback(
-    Output("download-unidades", "data"),
-    Input("csv-button", "n_clicks"),
-    State("unidades-table", "rowData"),  # ← usa rowData en AG Grid
-    prevent_initial_call=True
-)
-def download_csv(n, rows):
-    # Asegura que rows no esté vacío
-    df = pd.DataFrame(rows or [])
+def exportar_unidades(args):
+    # mismo orden que la tabla: por Disponibles
+    df = datasets.get("unidades", cargar_unidades, TTL_UNIDADES)
+    df = df.sort_values(DISPONIBLES, ascending=False) if not df.empty else df
+    return df[[col for col in schema.columnas("unidades") if col in df.columns]]
 
-    # Ordenar columnas deseadas, si existen
-    columnas_deseadas = ["Proyecto", "Disponibles","Asignada","Pagando","Liquidada", "Solicitud", "Liberacion", "Autorizadas","Escriturada", "Bloqueado","Vendidas", "Total"]
-    columnas_presentes = [col for col in columnas_deseadas if col in df.columns]
-    df = df[columnas_presentes]
 
-    # Exporta a CSV
-    return dcc.send_data_frame(df.to_csv, "Unidades.csv", index=False, encoding="utf-8-sig")
+exports.registrar("unidades", "Unidades", exportar_unidades)
@@ -0,0 +1,62 @@
+# partitions.py
+# Particiones de un frame por columna (asesor, proyecto): las posiciones de las filas de cada
+# valor se calculan una vez por versión del dataset (un groupby), así cada request toma su
+# rebanada con un iloc en vez de comparar la columna completa.
+# El alcance del request sale de la identidad del JWT: los admins (DASHBOARD_ADMINS) ven todo,
+# cualquier otro usuario solo la partición de su correo. Sin sesión el callback no responde
+# (el guard de assets/guards.js manda a /login) y /export contesta 401.
+import os
+
+import flask
+import numpy as np
+from dash.exceptions import PreventUpdate
+
+import auth
+import metrics
+
+TODO = "*"  # alcance sin partición: admins, y llamadas sin request (bench, scripts)
+ADMINS = {c.strip().casefold() for c in os.environ.get("DASHBOARD_ADMINS", "admin@example.com").split(",") if c.strip()}
+
+_VACIO = np.empty(0, dtype=np.intp)
+
+ALCANCES = metrics.counter("partition_requests_total", "Requests por tipo de alcance", ["dataset", "alcance"])
+
+
+class Particiones:
+    def __init__(self, df, columnas):
+        self.df = df
+        # {columna: {valor: posiciones ordenadas}}; NaN no forma partición
+        self._indices = {c: df.groupby(c, observed=True, sort=False).indices for c in columnas if c in df}
+
+    def valores(self, columna):
+        return list(self._indices.get(columna, {}))
+
+    def posiciones(self, **filtros):
+        # intersección de las particiones pedidas; None = sin filtro (todas las filas)
+        pos = None
+        for columna, valor in filtros.items():
+            if valor is None:
+                continue
+            p = self._indices.get(columna, {}).get(valor, _VACIO)
+            pos = p if pos is None else np.intersect1d(pos, p, assume_unique=True)
+        return pos
+
+    def rebanada(self, **filtros):
+        pos = self.posiciones(**filtros)
+        return self.df if pos is None else self.df.iloc[pos]
+
+
+def alcance(dataset):
+    # TODO o el correo (normalizado) del usuario. Sin sesión (cookie vencida o sin CSRF): en un callback
+    # PreventUpdate, mejor dejar lo que ya se ve que pintar tarjetas y gráficas vacías; en una ruta
+    # de Flask (/export) un 401, PreventUpdate ahí sería un 500
+    if not flask.has_request_context():
+        return TODO
+    correo = str(auth.identidad() or "").strip().casefold()
+    tipo = "todo" if correo in ADMINS else ("asesor" if correo else "anonimo")
+    ALCANCES.inc(dataset=dataset, alcance=tipo)
+    if tipo == "anonimo":
+        if flask.request.path.endswith("/_dash-update-component"):
+            raise PreventUpdate
+        flask.abort(401)
+    return TODO if tipo == "todo" else correo
@@ -0,0 +1,59 @@
+# patches.py
+# Respuestas parciales con dash.Patch: en vez de reenviar la figura o la lista de opciones
+# completa, solo lo que cambió respecto de lo que ya tiene el navegador. El "anterior" lo
+# reconstruye el servidor (caché de figuras, historial de versiones), no lo sube el cliente.
+import difflib
+import json
+
+from dash import Patch, no_update
+
+
+def _secuencia(p, anterior, nueva):
+    # escribe en `p` (un Patch o una ubicación dentro de él) los cambios de una lista a otra;
+    # regresa cuántos elementos se reusaron sin reenviarse
+    llaves = [json.dumps(x, sort_keys=True) for x in anterior], [json.dumps(x, sort_keys=True) for x in nueva]
+    reusados = 0
+    # de atrás hacia adelante: así los índices de `anterior` siguen valiendo
+    for tag, i1, i2, j1, j2 in reversed(difflib.SequenceMatcher(None, *llaves, autojunk=False).get_opcodes()):
+        if tag == "equal":
+            reusados += i2 - i1
+        elif tag == "replace" and i2 - i1 == j2 - j1:
+            for k in range(i2 - i1):
+                p[i1 + k] = nueva[j1 + k]
+        else:
+            for i in range(i2 - 1, i1 - 1, -1):
+                del p[i]
+            for j in range(j2 - 1, j1 - 1, -1):
+                p.insert(i1, nueva[j])
+    return reusados
+
+
+def figura(anterior, nueva):
+    # trazas como lista (altas, bajas y cambios en su posición) y layout por llave de primer nivel;
+    # anterior=None -> figura completa
+    if anterior is None:
+        return nueva
+    if anterior == nueva:
+        return no_update
+    p = Patch()
+    if not _secuencia(p["data"], anterior.get("data", []), nueva.get("data", [])):
+        return nueva  # no se reusa ninguna traza: el parche pesaría lo mismo
+
+    la, ln = anterior.get("layout", {}), nueva.get("layout", {})
+    for k in la.keys() - ln.keys():
+        del p["layout"][k]
+    for k, v in ln.items():
+        if la.get(k) != v:
+            p["layout"][k] = v
+    return p
+
+
+def lista(anterior, nueva):
+    # opciones de un dropdown (u otra lista de dicts): solo altas, bajas y cambios en su posición
+    if anterior is None:
+        return nueva
+    if anterior == nueva:
+        return no_update
+    p = Patch()
+    _secuencia(p, anterior, nueva)
+    return p
@@ -0,0 +1,163 @@
+# profiling.py
+# Instrumentación opcional de los callbacks de Dash (DASHBOARD_PROFILE=1 o =sample):
+# tiempo total, tiempo por etapa (datos / figura), bytes de request y response,
+# y en modo "sample" un muestreador de stacks para armar flamegraphs.
+import collections
+import contextlib
+import contextvars
+import html
+import os
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+import flask
+from dash import _callback
+
+import metrics
+
+MODO = os.environ.get("DASHBOARD_PROFILE", "").lower()   # "", "1" o "sample"
+INTERVALO = float(os.environ.get("DASHBOARD_PROFILE_INTERVAL", "0.005"))  # segundos entre muestras
+
+SECONDS = metrics.histogram(
+    "dash_callback_seconds", "Tiempo total del callback", ["callback"])
+STAGE_SECONDS = metrics.histogram(
+    "dash_callback_stage_seconds", "Tiempo por etapa dentro del callback", ["callback", "etapa"])
+REQUEST_BYTES = metrics.histogram(
+    "dash_callback_request_bytes", "JSON recibido por el callback", ["callback"], buckets=metrics.BYTES)
+RESPONSE_BYTES = metrics.histogram(
+    "dash_callback_response_bytes", "JSON devuelto por el callback", ["callback"], buckets=metrics.BYTES)
+
+_actual = contextvars.ContextVar("callback_actual", default=None)
+_lock = threading.Lock()
+_stats = {}       # callback -> {"tiempos": deque, "req": int, "resp": int, "etapas": {etapa: [suma, n]}}
+_activos = {}     # thread id -> callback en curso (lo que mira el muestreador)
+_muestras = collections.defaultdict(collections.Counter)  # callback -> {stack colapsado: muestras}
+
+
+def _stat(nombre):
+    return _stats.setdefault(nombre, {
+        "tiempos": collections.deque(maxlen=1000), "req": 0, "resp": 0, "etapas": {},
+    })
+
+
+@contextlib.contextmanager
+def etapa(nombre):
+    # marca una parte del callback (p. ej. "datos", "figura"); no hace nada si no se perfila
+    callback = _actual.get()
+    if callback is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        STAGE_SECONDS.observe(dt, callback=callback, etapa=nombre)
+        with _lock:
+            acc = _stat(callback)["etapas"].setdefault(nombre, [0.0, 0])
+            acc[0] += dt
+            acc[1] += 1
+
+
+def _envolver(nombre, fn):
+    def medido(*args, **kwargs):
+        token = _actual.set(nombre)
+        tid = threading.get_ident()
+        _activos[tid] = nombre
+        respuesta = None
+        t0 = time.perf_counter()
+        try:
+            respuesta = fn(*args, **kwargs)
+            return respuesta
+        finally:
+            dt = time.perf_counter() - t0
+            _activos.pop(tid, None)
+            _actual.reset(token)
+            req = (flask.request.content_length or 0) if flask.has_request_context() else 0
+            resp = len(respuesta) if isinstance(respuesta, (str, bytes)) else 0
+            SECONDS.observe(dt, callback=nombre)
+            REQUEST_BYTES.observe(req, callback=nombre)
+            RESPONSE_BYTES.observe(resp, callback=nombre)
+            with _lock:
+                s = _stat(nombre)
+                s["tiempos"].append(dt)
+                s["req"] += req
+                s["resp"] += resp
+
+    medido.__wrapped__ = fn
+    medido._perfilado = True
+    return medido
+
+
+def _muestrear():
+    while True:
+        time.sleep(INTERVALO)
+        frames = sys._current_frames()
+        for tid, nombre in list(_activos.items()):
+            frame, pila = frames.get(tid), []
+            while frame is not None:
+                code = frame.f_code
+                pila.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if pila:
+                with _lock:
+                    _muestras[nombre][";".join(reversed(pila))] += 1
+
+
+def init_profiling(app):
+    if MODO not in ("1", "true", "sample"):
+        return
+
+    # envuelve todos los @callback registrados (páginas y main.py); los clientside no tienen "callback"
+    vistos = set()
+    for mapa in (_callback.GLOBAL_CALLBACK_MAP, app.callback_map):
+        for output, entrada in mapa.items():
+            fn = entrada.get("callback")
+            if fn is None or getattr(fn, "_perfilado", False):
+                continue
+            nombre = getattr(fn, "__name__", output)
+            if nombre in vistos:  # mismo nombre en dos callbacks (p. ej. opts_proyectos)
+                nombre = f"{nombre}[{output.split('@')[0].strip('.')}]"
+            vistos.add(nombre)
+            entrada["callback"] = _envolver(nombre, fn)
+
+    if MODO == "sample":
+        threading.Thread(target=_muestrear, name="profiling-sampler", daemon=True).start()
+
+    server = app.server
+
+    @server.route("/debug/callbacks")
+    def debug_callbacks():
+        with _lock:
+            filas = []
+            for nombre, s in sorted(_stats.items()):
+                t = list(s["tiempos"])
+                n = len(t) or 1
+                etapas = ", ".join(f"{e}: {acc[0] / acc[1] * 1000:.1f} ms"
+                                   for e, acc in s["etapas"].items() if acc[1])
+                perfil = (f'<a href="/debug/callbacks/perfil/{quote(nombre)}">stacks</a>'
+                          if _muestras.get(nombre) else "")
+                filas.append(
+                    f"<tr><td>{html.escape(nombre)}</td><td>{len(t)}</td>"
+                    f"<td>{metrics.percentil(t, .5) * 1000:.1f}</td><td>{metrics.percentil(t, .95) * 1000:.1f}</td>"
+                    f"<td>{max(t, default=0) * 1000:.1f}</td>"
+                    f"<td>{s['req'] / n:,.0f}</td><td>{s['resp'] / n:,.0f}</td>"
+                    f"<td>{html.escape(etapas)}</td><td>{perfil}</td></tr>"
+                )
+        return (
+            "<html><body><h3>Callbacks</h3><table border=1 cellpadding=4>"
+            "<tr><th>callback</th><th>llamadas</th><th>p50 ms</th><th>p95 ms</th><th>max ms</th>"
+            "<th>request bytes</th><th>response bytes</th><th>etapas (promedio)</th><th></th></tr>"
+            + "".join(filas) + "</table></body></html>"
+        )
+
+    @server.route("/debug/callbacks/perfil/<nombre>")
+    def debug_perfil(nombre):
+        # stacks colapsados: entrada directa para flamegraph.pl / speedscope
+        with _lock:
+            muestras = dict(_muestras.get(nombre, {}))
+        texto = "\n".join(f"{pila} {n}" for pila, n in
+                          sorted(muestras.items(), key=lambda x: -x[1]))
+        return texto + "\n", 200, {"Content-Type": "text/plain; charset=utf-8"}
@@ -0,0 +1,128 @@
+# scheduler.py
+# Recargas de datasets en hilos del servidor: cada dataset registrado se refresca con su
+# propia cadencia (con jitter) y con backoff exponencial si la base falla. Cada recarga
+# exitosa sube la versión en la caché; los navegadores solo comparan su token con el vigente.
+import logging
+import os
+import random
+import threading
+import time
+
+import metrics
+from cache import datasets
+
+log = logging.getLogger(__name__)
+
+JITTER = 0.1        # ±10 % sobre cada espera, para que los datasets (y los workers) no coincidan
+BACKOFF_BASE = 15   # segundos tras el primer error; se duplica por error seguido
+BACKOFF_MAX = 600
+SONDEO = 2          # con DASHBOARD_SHARED_DIR: cada cuánto se adopta lo que publicó otro worker
+
+REFRESCOS = metrics.counter("scheduler_refresh_total", "Recargas programadas por resultado", ["dataset", "status"])
+SECONDS = metrics.histogram("scheduler_refresh_seconds", "Tiempo de cada recarga programada", ["dataset"])
+
+
+class _Tarea:
+    __slots__ = ("nombre", "loader", "cada", "cambio", "fallos", "proximo")
+
+    def __init__(self, nombre, loader, cada, cambio):
+        self.nombre = nombre
+        self.loader = loader
+        self.cada = cada
+        self.cambio = cambio   # sonda barata opcional: False = no hay nada nuevo, no recargar
+        self.fallos = 0        # errores seguidos
+        self.proximo = 0.0     # time.monotonic() de la siguiente corrida
+
+
+_tareas = {}
+_alto = threading.Event()
+_iniciado = False
+_lock = threading.Lock()
+
+metrics.gauge("scheduler_consecutive_failures", "Errores seguidos por dataset",
+              lambda: {t.nombre: t.fallos for t in list(_tareas.values())}, labels=["dataset"])
+
+
+def registrar(nombre, loader, cada, cambio=None):
+    # nombre = llave en `datasets`; loader = la misma función que usan los callbacks
+    _tareas[nombre] = _Tarea(nombre, loader, cada, cambio)
+
+
+def _espera(t):
+    base = t.cada if not t.fallos else min(BACKOFF_BASE * 2 ** (t.fallos - 1), BACKOFF_MAX)
+    return base * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+def correr(t):
+    # una recarga; regresa True si terminó sin error
+    fallo = []
+
+    def cargar():
+        try:
+            return t.loader()
+        except Exception as exc:
+            fallo.append(exc)
+            raise
+
+    t0 = time.perf_counter()
+    try:
+        if t.cambio is None or t.cambio():
+            datasets.refresh(t.nombre, cargar)  # la caché se queda con el frame anterior si falla
+            status = "error" if fallo else "ok"
+        else:
+            status = "sin_cambios"
+    except Exception:
+        log.exception("Falló la recarga programada de %s", t.nombre)
+        status = "error"
+    SECONDS.observe(time.perf_counter() - t0, dataset=t.nombre)
+    REFRESCOS.inc(dataset=t.nombre, status=status)
+    t.fallos = t.fallos + 1 if status == "error" else 0
+    return status != "error"
+
+
+def _bucle(t):
+    while not _alto.is_set():
+        correr(t)
+        t.proximo = time.monotonic() + _espera(t)
+        # entre corridas solo se revisa el puntero compartido (no hace nada sin shared.py)
+        while not _alto.wait(min(SONDEO, max(t.proximo - time.monotonic(), 0))):
+            if time.monotonic() >= t.proximo:
+                break
+            datasets.sincronizar(t.nombre)
+
+
+def _al_nacer():
+    # un hijo de fork (gunicorn --preload) no tiene los hilos del padre: arranca los suyos
+    global _iniciado, _lock
+    _iniciado, _lock = False, threading.Lock()
+
+
+os.register_at_fork(after_in_child=_al_nacer)
+
+
+def init_scheduler(server):
+    # con el primer request de cada proceso, no al importar: así corre en cada worker (también
+    # con --preload, donde el import es del proceso maestro) y no en el proceso vigía del reloader
+    # de app.run(debug=True), que nunca atiende requests. DASHBOARD_SCHEDULER=0 lo apaga
+    if os.environ.get("DASHBOARD_SCHEDULER", "1") == "0":
+        return
+
+    @server.before_request
+    def arrancar_scheduler():
+        if not _iniciado:
+            iniciar()
+
+
+def iniciar():
+    # un hilo por dataset: una carga lenta de contratos no atrasa la sonda de unidades
+    global _iniciado
+    with _lock:
+        if _iniciado:
+            return
+        _iniciado = True
+    for t in _tareas.values():
+        threading.Thread(target=_bucle, args=(t,), name=f"scheduler-{t.nombre}", daemon=True).start()
+
+
+def detener():
+    _alto.set()
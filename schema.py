@@ -0,0 +1,75 @@
+# schema.py
+# Un esquema por dataset: qué campos hay, de qué tipo, cómo se muestran y quién los usa.
+# De aquí salen los columnDefs de AG Grid, el orden del CSV y la proyección del SELECT,
+# así que la consulta solo trae lo que algún consumidor necesita.
+MONEDA = {"function": "d3.format('$,.2f')(params.value)"}
+
+# tipo -> columnDef base en AG Grid
+TIPOS = {
+    "texto":  {},
+    "id":     {"filter": "agNumberColumnFilter"},
+    "entero": {"type": "numericColumn", "filter": "agNumberColumnFilter"},
+    "monto":  {"type": "numericColumn", "filter": "agNumberColumnFilter", "valueFormatter": MONEDA},
+    "fecha":  {"filter": "agDateColumnFilter"},
+}
+
+# consumidores: grid, csv, filtros (dropdowns), kpis, grafica, sync (llave del upsert), delta (solo incremental),
+# particion (llave de partitions.py)
+VISIBLE = ("grid", "csv")
+
+_esquemas = {}
+
+
+class Campo:
+    __slots__ = ("nombre", "sql", "grupo", "tipo", "usos", "col")
+
+    def __init__(self, nombre, sql=None, tipo="texto", usos=VISIBLE, grupo=None, **col):
+        self.nombre = nombre
+        self.sql = sql            # expresión en el SELECT (None: se calcula en pandas)
+        self.grupo = grupo        # columna(s) de GROUP BY de las que sale; None si es agregado
+        self.tipo = tipo
+        self.usos = frozenset(usos)
+        self.col = col            # extras del columnDef (headerName, width, ...)
+
+
+def registrar(dataset, campos):
+    # campos: Campo o una función que regresa [Campo] (columnas que dependen de un catálogo)
+    _esquemas[dataset] = list(campos)
+
+
+def campos(dataset, uso=None):
+    salida = []
+    for c in _esquemas[dataset]:
+        salida.extend(c() if callable(c) else [c])
+    return [c for c in salida if uso is None or uso in c.usos]
+
+
+def columnas(dataset, uso="csv"):
+    return [c.nombre for c in campos(dataset, uso)]
+
+
+def de_tipo(dataset, tipo):
+    return [c.nombre for c in campos(dataset) if c.tipo == tipo]
+
+
+def column_defs(dataset):
+    return [{"field": c.nombre, **TIPOS[c.tipo], **c.col} for c in campos(dataset, "grid")]
+
+
+def _proyectados(dataset, excluir):
+    return [c for c in campos(dataset) if c.sql and c.usos - set(excluir)]
+
+
+def select(dataset, excluir=(), sangria=12):
+    # "expr AS Campo" de lo que usa algún consumidor fuera de `excluir`
+    pad = " " * sangria
+    return ",\n".join(f"{pad}{c.sql:<40} AS {c.nombre}" for c in _proyectados(dataset, excluir))
+
+
+def group_by(dataset, excluir=(), sangria=12):
+    vistos = []
+    for c in _proyectados(dataset, excluir):
+        for g in ([c.grupo] if isinstance(c.grupo, str) else c.grupo or []):
+            if g not in vistos:
+                vistos.append(g)
+    return ",\n".join(" " * sangria + g for g in vistos)
@@ -0,0 +1,54 @@
+# search.py
+# Búsqueda del lado del servidor para dropdowns con muchos valores (clientes): el índice se
+# arma una vez por versión del dataset y cada tecla cuesta unos bisect sobre listas ordenadas.
+#   - nombre completo que empieza con lo tecleado ("jose p" -> "José Pérez ...")
+#   - cada palabra tecleada es prefijo de alguna palabra del nombre ("per jo" -> "José Pérez")
+# Sin acentos ni mayúsculas en ambos lados.
+import bisect
+import heapq
+import unicodedata
+
+_FIN = "\uffff"  # mayor que cualquier carácter de un nombre: cierra el rango de un prefijo
+
+
+def normalizar(texto):
+    # "  José  ÑÚÑEZ " -> "jose nunez"
+    s = unicodedata.normalize("NFKD", str(texto))
+    return " ".join("".join(ch for ch in s if not unicodedata.combining(ch)).casefold().split())
+
+
+def _rango(ordenadas, prefijo):
+    return bisect.bisect_left(ordenadas, prefijo), bisect.bisect_left(ordenadas, prefijo + _FIN)
+
+
+class Indice:
+    def __init__(self, nombres):
+        pares = sorted((normalizar(n), n) for n in set(nombres))
+        self.claves = [k for k, _ in pares]    # normalizados, en orden
+        self.nombres = [n for _, n in pares]   # originales, misma posición
+        palabras = sorted((p, i) for i, k in enumerate(self.claves) for p in set(k.split()))
+        self._palabras = [p for p, _ in palabras]
+        self._posiciones = [i for _, i in palabras]
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def buscar(self, consulta, k=50):
+        # hasta k nombres: primero los que empiezan con la consulta, luego los de palabras; alfabético
+        q = normalizar(consulta or "")
+        if not q:
+            return self.nombres[:k]
+
+        a, b = _rango(self.claves, q)
+        primeros = list(range(a, min(b, a + k)))
+        if len(primeros) < k:
+            candidatos = None
+            for palabra in q.split():
+                a, b = _rango(self._palabras, palabra)
+                encontrados = set(self._posiciones[a:b])
+                candidatos = encontrados if candidatos is None else candidatos & encontrados
+                if not candidatos:
+                    break
+            candidatos.difference_update(primeros)
+            primeros += heapq.nsmallest(k - len(primeros), candidatos)
+        return [self.nombres[i] for i in primeros]
@@ -0,0 +1,126 @@
+# shared.py
+# Datasets compartidos entre workers (gunicorn -w N) con DASHBOARD_SHARED_DIR=/ruta:
+# el worker que gana el lock consulta la base y escribe la versión como archivo Arrow IPC;
+# los demás esperan ese mismo lock y hacen memory-map del archivo. Una consulta por
+# refresco en lugar de N, y los buffers viven una sola vez en el page cache.
+#   <dir>/<dataset>.lock           flock entre procesos (single-flight)
+#   <dir>/<dataset>.json           puntero a la versión vigente (se reemplaza con rename)
+#   <dir>/<dataset>.<version>.arrow
+import fcntl
+import json
+import os
+import time
+
+from cache import datasets
+
+try:  # solo hace falta con DASHBOARD_SHARED_DIR
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = ipc = None
+
+DIRECTORIO = os.environ.get("DASHBOARD_SHARED_DIR")
+CONSERVAR = 4  # archivos por dataset; borrar uno mapeado es seguro (el inode vive hasta el munmap)
+
+
+def reemplazar(ruta, escribir):
+    # escribe a un temporal del mismo directorio y renombra: nadie ve un archivo a medias
+    # (también lo usa snapshots.py)
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    escribir(tmp)
+    os.replace(tmp, ruta)
+
+
+class Almacen:
+    def __init__(self, directorio, nombre, fresco):
+        if pa is None:
+            raise RuntimeError("DASHBOARD_SHARED_DIR requiere pyarrow")
+        self.dir = directorio
+        self.nombre = nombre
+        self.fresco = fresco  # una versión publicada hace menos de esto se adopta en vez de consultar
+        self._mtime = None
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, sufijo):
+        return os.path.join(self.dir, f"{self.nombre}.{sufijo}")
+
+    def puntero(self):
+        try:
+            with open(self._ruta("json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def escribir(self, df, version, **meta):
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+        def arrow(tmp):
+            with pa.OSFile(tmp, "wb") as f, ipc.new_file(f, tabla.schema) as w:
+                w.write_table(tabla)
+
+        def puntero(tmp):
+            with open(tmp, "w") as f:
+                json.dump({"version": version, "escrito": time.time(), "filas": len(df),
+                           "attrs": df.attrs, **meta}, f, default=str)
+
+        reemplazar(self._ruta(f"{version}.arrow"), arrow)
+        reemplazar(self._ruta("json"), puntero)
+        for viejo in range(version - CONSERVAR, 0, -1):
+            try:
+                os.remove(self._ruta(f"{viejo}.arrow"))
+            except FileNotFoundError:
+                break
+
+    def leer(self, p):
+        # sin copiar a la memoria del proceso: los buffers de Arrow apuntan al archivo mapeado
+        tabla = ipc.open_file(pa.memory_map(self._ruta(f"{p['version']}.arrow"))).read_all()
+        df = tabla.to_pandas(split_blocks=True)
+        df.attrs.update(p.get("attrs") or {})
+        return df, p["version"]
+
+    def adoptar(self, local):
+        # lo que otro worker publicó después de nuestra versión; un stat si no cambió el puntero
+        try:
+            mtime = os.stat(self._ruta("json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self._mtime:
+            return None
+        p = self.puntero()
+        if p is None or p["version"] <= local:
+            self._mtime = mtime
+            return None
+        self._mtime = mtime
+        return self.leer(p)
+
+    def cargar(self, loader, local):
+        # -> (frame, versión, True si este worker consultó la base)
+        with open(self._ruta("lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # si otro worker está consultando, se espera a él
+            try:
+                p = self.puntero()
+                # alguien acaba de refrescar: no se repite la consulta. ">=": con el sondeo del
+                # scheduler este worker casi siempre ya adoptó esa versión antes de que le toque
+                if p is not None and p["version"] >= local and time.time() - p["escrito"] < self.fresco:
+                    return (*self.leer(p), False)
+                t0 = time.time()
+                df = loader()
+                version = max(p["version"] if p else 0, local) + 1
+                self.escribir(df, version, segundos=time.time() - t0)
+                return (*self.leer(self.puntero()), True)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+_almacenes = {}  # nombre -> Almacen (también lo usan los procesos de background.py)
+
+
+def compartir(nombre, fresco):
+    # no hace nada si no se configuró DASHBOARD_SHARED_DIR (un solo proceso)
+    if DIRECTORIO:
+        _almacenes[nombre] = Almacen(DIRECTORIO, nombre, fresco)
+        datasets.compartir(nombre, _almacenes[nombre])
+
+
+def almacen(nombre):
+    return _almacenes.get(nombre)
@@ -0,0 +1,119 @@
+# snapshots.py
+# Las últimas versiones de cada dataset en Parquet local, con su metadata
+# (hora de consulta, filas, duración). Al arrancar se sirve la más nueva mientras
+# la primera carga real corre en segundo plano; si la base no responde, se sigue
+# sirviendo esa. DASHBOARD_SNAPSHOT_DIR="" lo apaga.
+#   <dir>/<dataset>/<ns>.parquet + <ns>.json   (el .json se escribe al final: es la marca de "completo")
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import metrics
+from cache import datasets
+from shared import reemplazar
+
+try:  # Parquet es opcional
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+log = logging.getLogger(__name__)
+
+DIRECTORIO = os.environ.get("DASHBOARD_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "dashboard-snapshots"))
+CONSERVAR = int(os.environ.get("DASHBOARD_SNAPSHOTS", "3"))
+
+ESCRITOS = metrics.counter("snapshots_written_total", "Snapshots escritos por dataset", ["dataset"])
+_cargados = {}  # dataset -> metadata del snapshot con el que se arrancó
+metrics.gauge("snapshot_warm_start_age_seconds", "Antigüedad del snapshot servido al arrancar",
+              lambda: {k: time.time() - m["escrito"] for k, m in _cargados.items()}, labels=["dataset"])
+
+_columnas = {}  # dataset -> columnas que debe traer un snapshot para servirse
+
+
+def _dir(dataset):
+    return os.path.join(DIRECTORIO, dataset)
+
+
+def _metas(dataset):
+    # metadata de los snapshots completos, del más nuevo al más viejo
+    try:
+        nombres = sorted((n for n in os.listdir(_dir(dataset)) if n.endswith(".json")), reverse=True)
+    except FileNotFoundError:
+        return []
+    metas = []
+    for n in nombres:
+        try:
+            with open(os.path.join(_dir(dataset), n)) as f:
+                metas.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return metas
+
+
+def guardar(dataset, df, meta):
+    if dataset not in _columnas:
+        return
+    # 0o700: por omisión el directorio vive en el temp compartido y los datos son de clientes
+    os.makedirs(DIRECTORIO, mode=0o700, exist_ok=True)
+    os.makedirs(_dir(dataset), mode=0o700, exist_ok=True)
+    nombre = str(time.time_ns())
+    base = os.path.join(_dir(dataset), nombre)
+    def metadata(tmp):
+        with open(tmp, "w") as f:
+            json.dump({
+                "archivo": nombre + ".parquet",
+                "escrito": time.time(),
+                "consultado": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "filas": len(df),
+                "segundos": round(meta.get("segundos", 0.0), 3),
+                "attrs": df.attrs,
+            }, f, default=str)
+
+    reemplazar(base + ".parquet", lambda tmp: df.to_parquet(tmp, index=False))
+    reemplazar(base + ".json", metadata)
+    ESCRITOS.inc(dataset=dataset)
+
+    for viejo in _metas(dataset)[CONSERVAR:]:
+        for ruta in (viejo["archivo"], viejo["archivo"].replace(".parquet", ".json")):
+            try:
+                os.remove(os.path.join(_dir(dataset), ruta))
+            except FileNotFoundError:
+                pass
+
+
+def ultimo(dataset):
+    # el snapshot más nuevo que se pueda leer y tenga las columnas esperadas (o None)
+    for meta in _metas(dataset):
+        try:
+            df = pd.read_parquet(os.path.join(_dir(dataset), meta["archivo"]))
+        except Exception:
+            log.warning("Snapshot ilegible de %s: %s", dataset, meta.get("archivo"))
+            continue
+        if not set(_columnas[dataset]) <= set(df.columns):
+            continue  # de otra versión del esquema
+        df.attrs.update(meta.get("attrs") or {})
+        return df, meta
+    return None
+
+
+def registrar(dataset, columnas=()):
+    # guarda cada consulta de `dataset` y arranca con el snapshot más nuevo
+    if not DIRECTORIO or pyarrow is None:
+        return
+    _columnas[dataset] = list(columnas)
+    datasets.sincronizar(dataset)  # con DASHBOARD_SHARED_DIR manda la versión publicada por otro worker
+    encontrado = ultimo(dataset)
+    if encontrado is not None:
+        df, meta = encontrado
+        datasets.precargar(dataset, df)
+        _cargados[dataset] = meta
+        log.info("%s: arranque con snapshot de %s (%s filas)", dataset, meta["consultado"], meta["filas"])
+
+
+if DIRECTORIO and pyarrow is not None:
+    datasets.al_cargar(guardar)
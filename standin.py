@@ -0,0 +1,162 @@
+# standin.py
+# Base local (SQLite) con las tablas de Arquimedes y datos sintéticos, para medir
+# sin tocar Azure SQL. Uso:
+#   DASHBOARD_DB_URL=sqlite://  +  standin.instalar(db.engine, ruta)  antes de importar main
+import os
+import re
+import sqlite3
+import zlib
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+
+ESTATUS_CONTRATO = ["Apartado", "Firma", "Pagando", "Liquidado", "Cancelado"]
+ESTATUS_UNIDAD = [
+    "Disponible", "Asignada", "Pagando", "Liquidada", "Solicitud", "Liberacion",
+    "Autorizada", "Escriturada", "Bloqueado", "Vendida", "Desconocido",
+]
+PAGOS_POR_CONTRATO = 6
+BLOQUE = 500_000  # filas por inserción (1M de contratos = 6M de ingresos)
+
+# T-SQL -> SQLite (lo poco que usan las consultas del tablero)
+_REESCRITURAS = [
+    (re.compile(r"\bCAST\(([^()]+?) AS date\)", re.I), r"date(\1)"),
+    (re.compile(r"\bISNULL\(", re.I), "IFNULL("),
+]
+
+_INDICES = [
+    "CREATE INDEX ix_ing_contrato ON AR_Ingresos (FK_Contrato)",
+    "CREATE INDEX ix_ct_update ON AR_Contratos (LastUpdateDate)",
+    "CREATE INDEX ix_un_proyecto ON AR_Unidades (FK_Proyecto)",
+]
+
+
+def _fechas(rng, n, hoy=pd.Timestamp("2025-01-01"), dias=900):
+    f = hoy - pd.to_timedelta(rng.integers(0, dias * 86400, n), unit="s")
+    return f.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def construir(ruta, contratos=10_000, semilla=0):
+    """Crea (o reemplaza) el archivo SQLite con ~`contratos` contratos sintéticos."""
+    rng = np.random.default_rng(semilla)
+    n = int(contratos)
+    n_cli = max(n // 3, 1)
+    n_proy = max(min(n // 500, 60), 3)
+    n_uni = max(int(n * 1.2), 1)
+    n_ases = max(min(n // 200, 300), 2)
+
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+    tablas = {
+        "AR_Clientes": lambda: pd.DataFrame({
+            "PK_Cliente": np.arange(1, n_cli + 1),
+            "Alias": [f"Cliente {i:07d}" for i in range(1, n_cli + 1)],
+        }),
+        "AR_Proyectos": lambda: pd.DataFrame({
+            "PK_Proyecto": np.arange(1, n_proy + 1),
+            "Nombre": [f"PROYECTO {i:03d}" for i in range(1, n_proy + 1)],
+        }),
+        "AR_Unidades": lambda: pd.DataFrame({
+            "PK_Unidad": np.arange(1, n_uni + 1),
+            "FK_Proyecto": rng.integers(1, n_proy + 1, n_uni),
+            "FK_EstatusUnidadRentable": rng.integers(1, len(ESTATUS_UNIDAD) + 1, n_uni),
+            "LastUpdateDate": _fechas(rng, n_uni),
+        }),
+        "CT_EstatusContrato": lambda: pd.DataFrame({
+            "PK_EstatusContrato": np.arange(1, len(ESTATUS_CONTRATO) + 1),
+            "Estatus": ESTATUS_CONTRATO,
+        }),
+        "CT_EstatusUnidadRentable": lambda: pd.DataFrame({
+            "PK_EstatusUnidadRentable": np.arange(1, len(ESTATUS_UNIDAD) + 1),
+            "Estatus": ESTATUS_UNIDAD,
+        }),
+        "AspNetUsers": lambda: pd.DataFrame({
+            "UserId": [f"u{i}" for i in range(1, n_ases + 1)],
+            "Nombre": [f"Asesor {i:03d}" for i in range(1, n_ases + 1)],
+            "Email": [f"asesor{i}@viverent.mx" for i in range(1, n_ases + 1)],
+        }),
+        "AR_Contratos": lambda: pd.DataFrame({
+            "PK_Contrato": np.arange(1, n + 1),
+            "FK_Cliente": rng.integers(1, n_cli + 1, n),
+            "FK_Unidad": rng.integers(1, n_uni + 1, n),
+            "Alias": [f"CT-{i:07d}" for i in range(1, n + 1)],
+            "MontoInversion": rng.integers(500_000, 8_000_000, n).astype(float),
+            "MontoApartado": rng.integers(10_000, 200_000, n).astype(float),
+            "LastUpdateDate": _fechas(rng, n),
+            "FechaFirma": pd.Series(_fechas(rng, n)).where(rng.random(n) < 0.7),
+            "FK_EstatusContrato": rng.integers(1, len(ESTATUS_CONTRATO) + 1, n),
+            "FK_UsuarioAsesor": pd.Series(rng.integers(1, n_ases + 1, n)).map("u{}".format),
+            "IsActive": (rng.random(n) < 0.9).astype(int),
+            "ID_interno_consolidado": pd.Series(rng.integers(1, 1000, n)).where(rng.random(n) < 0.05),
+        }),
+    }
+
+    filas = {}
+    with sqlite3.connect(ruta) as con:
+        for nombre, hacer in tablas.items():
+            df = hacer()
+            df.to_sql(nombre, con, index=False)
+            filas[nombre] = len(df)
+
+        # ingresos por bloques para no tener 6M de filas en memoria
+        n_ing, inicio = n * PAGOS_POR_CONTRATO, 1
+        while inicio <= n_ing:
+            k = min(BLOQUE, n_ing - inicio + 1)
+            pd.DataFrame({
+                "PK_Ingreso": np.arange(inicio, inicio + k),
+                "FK_Contrato": rng.integers(1, n + 1, k),
+                "Monto": rng.integers(1_000, 300_000, k).astype(float),
+                "Fecha": _fechas(rng, k),
+            }).to_sql("AR_Ingresos", con, index=False, if_exists="append")
+            inicio += k
+        filas["AR_Ingresos"] = n_ing
+
+        for sql in _INDICES:
+            con.execute(sql)
+    return filas
+
+
+class _ChecksumAgg:
+    def __init__(self):
+        self.valor = 0
+
+    def step(self, x):
+        if x is not None:
+            self.valor ^= int(x)
+
+    def finalize(self):
+        return self.valor
+
+
+class _CountBig:
+    def __init__(self):
+        self.valor = 0
+
+    def step(self, *args):
+        self.valor += 1
+
+    def finalize(self):
+        return self.valor
+
+
+def _checksum(*args):
+    return zlib.crc32(repr(args).encode()) - 2**31
+
+
+def instalar(engine, ruta):
+    """Cada conexión nueva adjunta `ruta` como esquema dbo y traduce el T-SQL del tablero."""
+
+    @event.listens_for(engine, "connect")
+    def _conectar(dbapi_con, _):
+        dbapi_con.execute(f"ATTACH DATABASE '{ruta}' AS dbo")
+        dbapi_con.create_function("CHECKSUM", -1, _checksum)
+        dbapi_con.create_aggregate("CHECKSUM_AGG", 1, _ChecksumAgg)
+        dbapi_con.create_aggregate("COUNT_BIG", -1, _CountBig)
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _traducir(conn, cursor, sql, params, context, executemany):
+        for patron, reemplazo in _REESCRITURAS:
+            sql = patron.sub(reemplazo, sql)
+        return sql, params
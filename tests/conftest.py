@@ -0,0 +1,26 @@
+# tests/conftest.py
+# La app se importa una sola vez por sesión contra una base standin chica (SQLite), igual que bench.py.
+import os
+import sys
+
+import pytest
+
+AQUI = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AQUI)
+# antes de que cualquier test importe db: el engine se crea al importar
+os.environ["DASHBOARD_DB_URL"] = "sqlite://"
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    import bench
+    import standin
+
+    ruta = str(tmp_path_factory.mktemp("standin") / "ar.sqlite")
+    standin.construir(ruta, 500)
+    return bench._importar(ruta)
+
+
+@pytest.fixture(scope="session")
+def cv(app):
+    return app[0]
@@ -0,0 +1,33 @@
+# tests/test_consultas.py
+# La consulta de contratos con ingresos preagregados debe dar lo mismo que la de GROUP BY (bench.sql_agrupada).
+import pandas as pd
+from sqlalchemy import text
+
+import bench
+import db
+
+
+def _leer(sql, params=None):
+    with db.engine.connect() as con:
+        df = pd.read_sql(text(sql), con, params=params)
+    return df.sort_values("Contrato").reset_index(drop=True)
+
+
+def _comparar(a, b):
+    pd.testing.assert_frame_equal(a, b[a.columns], check_dtype=False)
+
+
+def test_carga_completa_igual(cv):
+    agrupada = _leer(bench.sql_agrupada(cv, cv.FILTRO_ACTIVOS))
+    preagregada = _leer(cv.sql_contratos(cv.FILTRO_ACTIVOS, excluir=["delta"]))
+    assert len(agrupada) > 0
+    _comparar(agrupada, preagregada)
+
+
+def test_delta_igual(cv):
+    # cambios desde una fecha intermedia + ingresos nuevos: pasan por el filtro acotado de ingresos
+    params = {"desde": "2024-06-01 00:00:00", "ultimo_ingreso": 2500}
+    agrupada = _leer(bench.sql_agrupada(cv, cv.FILTRO_CAMBIOS, excluir=()), params)
+    preagregada = _leer(cv.sql_contratos(cv.FILTRO_CAMBIOS, acotar=True), params)
+    assert 0 < len(agrupada) < 500
+    _comparar(agrupada, preagregada)
@@ -0,0 +1,117 @@
+# tests/test_grid.py
+# filterModel / sortModel de AG Grid contra un frame chico: texto (object y categórica),
+# número, fecha, AND/OR, vacíos y orden.
+import numpy as np
+import pandas as pd
+import pytest
+
+import grid
+
+
+@pytest.fixture
+def df():
+    proyectos = ["AURUM", "tulum", None, "Aurum", "TULUM", "NORTE"]
+    return pd.DataFrame({
+        "Cliente": ["Ana", "beto", None, "Carla", "", "Álvaro"],
+        "Desarrollo": proyectos,                  # mismo texto en object y en categórica
+        "Proyecto": pd.Categorical(proyectos),
+        "Monto": [100.0, 250.0, np.nan, 50.0, 250.0, 400.0],
+        "Fecha": pd.to_datetime(["2024-01-10", "2024-02-01", None, "2024-03-15", "2024-01-31", "2024-02-20"]),
+    })
+
+
+def filas(df, filter_model=None, sort_model=None):
+    return grid.posiciones(df, filter_model, sort_model).tolist()
+
+
+def texto(tipo, valor=None):
+    return {"filterType": "text", "type": tipo, "filter": valor}
+
+
+@pytest.mark.parametrize("col", ["Desarrollo", "Proyecto"])
+@pytest.mark.parametrize("tipo, valor, esperado", [
+    ("contains", "u", [0, 1, 3, 4]),
+    ("equals", "aurum", [0, 3]),
+    ("startsWith", "t", [1, 4]),
+    ("endsWith", "M", [0, 1, 3, 4]),
+    # como en el navegador: las celdas vacías pasan notContains y notEqual
+    ("notContains", "u", [2, 5]),
+    ("notEqual", "aurum", [1, 2, 4, 5]),
+])
+def test_texto_sin_importar_mayusculas(df, col, tipo, valor, esperado):
+    assert filas(df, {col: texto(tipo, valor)}) == esperado
+
+
+def test_texto_categorica_sin_categorias():
+    df = pd.DataFrame({"Proyecto": pd.Categorical([None, None])})
+    assert filas(df, {"Proyecto": texto("contains", "a")}) == []
+    assert filas(df, {"Proyecto": texto("notContains", "a")}) == [0, 1]
+
+
+def test_vacios(df):
+    # "" y None cuentan como vacío en texto; NaN/NaT en número y fecha
+    assert filas(df, {"Cliente": {"filterType": "text", "type": "blank"}}) == [2, 4]
+    assert filas(df, {"Cliente": {"filterType": "text", "type": "notBlank"}}) == [0, 1, 3, 5]
+    assert filas(df, {"Monto": {"filterType": "number", "type": "blank"}}) == [2]
+    assert filas(df, {"Fecha": {"filterType": "date", "type": "notBlank"}}) == [0, 1, 3, 4, 5]
+
+
+@pytest.mark.parametrize("tipo, a, b, esperado", [
+    ("equals", 250, None, [1, 4]),
+    ("notEqual", 250, None, [0, 2, 3, 5]),
+    ("lessThan", 250, None, [0, 3]),
+    ("lessThanOrEqual", 250, None, [0, 1, 3, 4]),
+    ("greaterThan", 100, None, [1, 4, 5]),
+    ("greaterThanOrEqual", 100, None, [0, 1, 4, 5]),
+    ("inRange", 50, 400, [0, 1, 4]),  # excluyente en ambos extremos, como AG Grid
+])
+def test_numero(df, tipo, a, b, esperado):
+    assert filas(df, {"Monto": {"filterType": "number", "type": tipo, "filter": a, "filterTo": b}}) == esperado
+
+
+@pytest.mark.parametrize("tipo, desde, hasta, esperado", [
+    ("equals", "2024-02-01 00:00:00", None, [1]),
+    ("lessThan", "2024-02-01 00:00:00", None, [0, 4]),
+    ("greaterThan", "2024-02-01 00:00:00", None, [3, 5]),
+    ("inRange", "2024-01-10 00:00:00", "2024-03-15 00:00:00", [1, 4, 5]),
+])
+def test_fecha(df, tipo, desde, hasta, esperado):
+    assert filas(df, {"Fecha": {"filterType": "date", "type": tipo, "dateFrom": desde, "dateTo": hasta}}) == esperado
+
+
+def test_and_or(df):
+    condiciones = [{"type": "lessThan", "filter": 100}, {"type": "greaterThan", "filter": 300}]
+    o = {"Monto": {"filterType": "number", "operator": "OR", "conditions": condiciones}}
+    assert filas(df, o) == [3, 5]
+
+    condiciones = [{"type": "greaterThan", "filter": 50}, {"type": "lessThan", "filter": 300}]
+    y = {"Monto": {"filterType": "number", "operator": "AND", "conditions": condiciones}}
+    assert filas(df, y) == [0, 1, 4]
+
+    # varias columnas se combinan con AND
+    assert filas(df, {**y, "Cliente": texto("contains", "b")}) == [1]
+
+
+def test_columna_desconocida_y_sin_filtros(df):
+    assert filas(df) == list(range(len(df)))
+    assert filas(df, {"NoExiste": texto("equals", "x")}) == list(range(len(df)))
+
+
+def test_orden(df):
+    # estable, vacíos al final, varias columnas
+    assert filas(df, sort_model=[{"colId": "Monto", "sort": "asc"}]) == [3, 0, 1, 4, 5, 2]
+    assert filas(df, sort_model=[{"colId": "Monto", "sort": "desc"}]) == [5, 1, 4, 0, 3, 2]
+    orden = [{"colId": "Monto", "sort": "desc"}, {"colId": "Fecha", "sort": "asc"}]
+    assert filas(df, sort_model=orden) == [5, 4, 1, 0, 3, 2]
+
+
+def test_orden_despues_de_filtrar(df):
+    f = {"Monto": {"filterType": "number", "type": "greaterThanOrEqual", "filter": 100}}
+    assert filas(df, f, [{"colId": "Fecha", "sort": "desc"}]) == [5, 1, 4, 0]
+
+
+def test_bloque(df):
+    pos = grid.posiciones(df, sort_model=[{"colId": "Monto", "sort": "asc"}])
+    r = grid.bloque(df, pos, {"startRow": 1, "endRow": 3}, ["Cliente", "Fecha"])
+    assert r["rowCount"] == len(df)
+    assert r["rowData"] == [{"Cliente": "Ana", "Fecha": "2024-01-10"}, {"Cliente": "beto", "Fecha": "2024-02-01"}]